@@ -0,0 +1,67 @@
+"""
+Release-phase checks: are all migrations applied and is the collected static
+manifest current? Both answers come from cheap reads (the migration graph vs
+django_migrations, file mtimes vs staticfiles.json), so a process can verify
+them at boot and only migrate or collect when something is actually missing.
+"""
+import os
+
+from django.contrib.staticfiles.finders import get_finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Same defaults collectstatic applies when it walks the finders
+STATIC_IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    """``app_label.name`` of every migration not yet applied to ``database``."""
+    executor = MigrationExecutor(connections[database])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [f'{migration.app_label}.{migration.name}' for migration, backwards in plan if not backwards]
+
+
+def stale_static():
+    """
+    Static paths missing from the manifest or modified after it was written.
+    Storages without a manifest report nothing.
+    """
+    if not hasattr(staticfiles_storage, 'load_manifest'):
+        return []
+    try:
+        written = staticfiles_storage.manifest_storage.get_modified_time(
+            staticfiles_storage.manifest_name).timestamp()
+    except OSError:
+        return [staticfiles_storage.manifest_name]
+
+    collected, _ = staticfiles_storage.load_manifest()
+    stale = []
+    for finder in get_finders():
+        for source, storage in finder.list(STATIC_IGNORE_PATTERNS):
+            prefix = getattr(storage, 'prefix', None)
+            path = os.path.join(prefix, source) if prefix else source
+            if path not in collected:
+                stale.append(path)
+                continue
+            try:
+                if storage.get_modified_time(source).timestamp() > written:
+                    stale.append(path)
+            except (NotImplementedError, OSError):
+                pass
+    return stale
+
+
+def ensure_release(apply=False, stdout=None):
+    """
+    Report (and with ``apply`` redo) only the release work that is missing.
+    Returns ``(migrations, static)``: what was pending when called.
+    """
+    migrations = pending_migrations()
+    static = stale_static()
+    if apply and migrations:
+        call_command('migrate', interactive=False, verbosity=0, stdout=stdout)
+    if apply and static:
+        call_command('collectstatic', interactive=False, verbosity=0, stdout=stdout)
+    return migrations, static
@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 # --------------------------------------------------
 
 MIDDLEWARE = [
+    # Outermost, so its total covers every other middleware
+    "farm.middleware.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
 
@@ -71,6 +73,9 @@ MIDDLEWARE = [
 ROOT_URLCONF = "core.urls"
 WSGI_APPLICATION = "core.wsgi.application"
 
+# Points the file-based "auth" cache at a temporary directory for test runs
+TEST_RUNNER = "core.test_runner.TestRunner"
+
 # --------------------------------------------------
 # TEMPLATES
 # --------------------------------------------------
@@ -106,6 +111,72 @@ DATABASES = {
     }
 }
 
+# --------------------------------------------------
+# CACHES
+# --------------------------------------------------
+# "batches" holds serialized batch payloads keyed by (id, version); LocMemCache
+# evicts least-recently-used entries past MAX_ENTRIES. Set BATCH_CACHE_DIR to
+# share the cache between worker processes through a file-based backend.
+
+BATCH_CACHE_DIR = os.environ.get("BATCH_CACHE_DIR")
+
+# "auth" holds users resolved from JWTs. A save, deactivation or password reset
+# in any process (including reset_admin_password) must evict the entry for every
+# worker, so it is a file cache shared by all processes on the host, kept under
+# the project rather than the shared system temp dir (core.test_runner swaps in a
+# temporary directory for test runs). Run several hosts only with a network cache
+# (e.g. Redis) configured here instead.
+AUTH_CACHE_DIR = os.environ.get("AUTH_CACHE_DIR", str(BASE_DIR / ".cache" / "auth"))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "farm-default",
+    },
+    "batches": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache"
+            if BATCH_CACHE_DIR
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": BATCH_CACHE_DIR or "farm-batches",
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("BATCH_CACHE_MAX_ENTRIES", "5000"))},
+    },
+    # Users resolved from JWTs; see farm.authentication.CachedJWTAuthentication
+    "auth": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": AUTH_CACHE_DIR,
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
+# Seconds a JWT-resolved user may be served from the "auth" cache
+JWT_USER_CACHE_TTL = int(os.environ.get("JWT_USER_CACHE_TTL", "60"))
+
+# --------------------------------------------------
+# PERFORMANCE INSTRUMENTATION
+# --------------------------------------------------
+# farm.middleware.RequestTimingMiddleware: every response carries Server-Timing;
+# this fraction of requests is logged to "farm.perf", and requests past either
+# threshold are always logged with their slowest and repeated queries.
+
+PERF_LOG_SAMPLE_RATE = float(os.environ.get("PERF_LOG_SAMPLE_RATE", "0.01"))
+PERF_SLOW_REQUEST_MS = int(os.environ.get("PERF_SLOW_REQUEST_MS", "500"))
+PERF_QUERY_COUNT_THRESHOLD = int(os.environ.get("PERF_QUERY_COUNT_THRESHOLD", "30"))
+PERF_CAPTURED_QUERIES = 5
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "farm.perf": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 # --------------------------------------------------
 # PASSWORD VALIDATION
 # --------------------------------------------------
@@ -150,7 +221,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "farm.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
@@ -178,6 +249,7 @@ CORS_ALLOW_HEADERS = [
     "accept",
     "accept-encoding",
     "authorization",
+    "content-encoding",
     "content-type",
     "origin",
     "dnt",
@@ -0,0 +1,23 @@
+"""
+Test runner that keeps the suite out of the project's file caches: every run
+points the "auth" cache at a fresh temporary directory and removes it after.
+"""
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._auth_cache_dir = tempfile.TemporaryDirectory(prefix='farm-auth-cache-')
+        auth = {**settings.CACHES['auth'], 'LOCATION': self._auth_cache_dir.name}
+        self._cache_override = override_settings(CACHES={**settings.CACHES, 'auth': auth})
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        self._auth_cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
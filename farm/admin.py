@@ -1,11 +1,26 @@
+import io
+
+from django import forms
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.urls import path
 from django.shortcuts import render
 from django.utils.html import format_html
 
+from .imports import IMPORT_COLUMNS, CsvImporter, ImportInterrupted, write_error_report
 from .models import AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, ShopItem
 
 
+class CsvImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[(kind, kind.capitalize()) for kind in IMPORT_COLUMNS])
+    file = forms.FileField(help_text="CSV with the same columns as the CSV export")
+    start_line = forms.IntegerField(required=False, min_value=2,
+                                    help_text="Skip rows before this line of the file, to resume an interrupted import")
+    error_report = forms.BooleanField(required=False, label="Download rejected rows",
+                                      help_text="Return every rejected row as CSV instead of listing the first 100")
+
+
 # ============================
 # INLINE TABLES
 # ============================
@@ -16,6 +31,9 @@ class ExpenseInline(admin.TabularInline):
     fields = ('description', 'amount', 'recorded_by', 'created_at')
     readonly_fields = ('recorded_by', 'created_at')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recorded_by')
+
 
 class FeedingInline(admin.TabularInline):
     model = FeedingRecord
@@ -23,6 +41,9 @@ class FeedingInline(admin.TabularInline):
     fields = ('bags', 'amount', 'note', 'recorded_by', 'created_at')
     readonly_fields = ('recorded_by', 'created_at')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recorded_by')
+
 
 class MortalityInline(admin.TabularInline):
     model = MortalityRecord
@@ -31,6 +52,9 @@ class MortalityInline(admin.TabularInline):
     readonly_fields = ('approved', 'approved_by', 'created_at')
     can_delete = False     # Prevent admin from bypassing logic
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('approved_by')
+
 
 # ============================
 # ACTIONS
@@ -38,14 +62,14 @@ class MortalityInline(admin.TabularInline):
 
 @admin.action(description="Approve selected mortalities")
 def approve_mortalities(modeladmin, request, queryset):
-    for m in queryset:
-        m.approve(request.user)
+    approved = queryset.approve(request.user)
+    modeladmin.message_user(request, f"Approved {approved} mortality record(s).")
 
 
 @admin.action(description="Move selected batches to shop")
 def move_batches_to_shop(modeladmin, request, queryset):
-    for b in queryset:
-        b.move_to_shop(by_user=request.user)
+    moved = queryset.move_to_shop(by_user=request.user)
+    modeladmin.message_user(request, f"Moved {len(moved)} batch(es) to the shop.")
 
 
 # ============================
@@ -59,6 +83,8 @@ class BatchAdmin(admin.ModelAdmin):
         'initial_quantity', 'current_quantity',
         'is_moved_to_shop', 'view_report_button'
     )
+    list_select_related = ('animal',)
+    change_list_template = 'admin/farm/batch/change_list.html'
 
     inlines = [ExpenseInline, FeedingInline, MortalityInline]
 
@@ -77,21 +103,24 @@ class BatchAdmin(admin.ModelAdmin):
                 '<int:batch_id>/report/',
                 self.admin_site.admin_view(self.batch_report_view),
                 name='batch-report'
-            )
+            ),
+            path('import/', self.admin_site.admin_view(self.import_csv_view), name='batch-import'),
         ]
         return custom_urls + urls
 
     def batch_report_view(self, request, batch_id):
-        batch = Batch.objects.get(pk=batch_id)
+        batch = Batch.objects.select_related('animal').get(pk=batch_id)
 
         context = {
             'batch': batch,
-            'expenses': batch.expenses.all(),
-            'feedings': batch.feeding_records.all(),
-            'mortalities': batch.mortalities.all(),
-
-            'total_expenses': batch.total_expenses(),
-            'total_feed': batch.total_feed(),
+            'expenses': batch.expenses.select_related('recorded_by'),
+            'feedings': batch.feeding_records.select_related('recorded_by'),
+            'mortalities': batch.mortalities.select_related('approved_by'),
+
+            # Stored running totals, no aggregate queries
+            'total_expenses': batch.expenses_total,
+            'total_feed': batch.feed_total,
+            'total_feed_bags': batch.feed_bags_total,
             'total_cost': batch.total_cost,
             'unit_cost': batch.unit_cost,
 
@@ -100,6 +129,38 @@ class BatchAdmin(admin.ModelAdmin):
 
         return render(request, 'admin/batch_report.html', context)
 
+    def import_csv_view(self, request):
+        # Same importer as the import_farm_csv command; use the command for very large files
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = CsvImportForm(request.POST or None, request.FILES or None)
+        importer = None
+        if request.method == 'POST' and form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            importer = CsvImporter(form.cleaned_data['kind'], user=request.user)
+            try:
+                importer.run(lines, start_line=form.cleaned_data['start_line'])
+            except ValueError as exc:
+                form.add_error('file', str(exc))
+                importer = None
+            except ImportInterrupted as exc:
+                form.add_error(None, f"{exc}: rows up to line {exc.resume_line - 1} are committed; "
+                                     f"upload the file again with start line {exc.resume_line} to continue.")
+            if importer and importer.errors and form.cleaned_data['error_report']:
+                response = HttpResponse(content_type='text/csv')
+                response['Content-Disposition'] = f'attachment; filename="{form.cleaned_data["kind"]}-rejected.csv"'
+                write_error_report(importer.errors, response)
+                return response
+
+        context = {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'importer': importer,
+            'errors': importer.errors[:100] if importer else [],
+            'title': "Import records from CSV",
+        }
+        return render(request, 'admin/import_csv.html', context)
+
 
 # ============================
 # REGISTER OTHER MODELS
@@ -113,16 +174,19 @@ class AnimalTypeAdmin(admin.ModelAdmin):
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
     list_display = ('batch', 'description', 'amount', 'recorded_by', 'created_at')
+    list_select_related = ('batch', 'recorded_by')
 
 
 @admin.register(FeedingRecord)
 class FeedingAdmin(admin.ModelAdmin):
     list_display = ('batch', 'bags', 'amount', 'note', 'recorded_by', 'created_at')
+    list_select_related = ('batch', 'recorded_by')
 
 
 @admin.register(MortalityRecord)
 class MortalityAdmin(admin.ModelAdmin):
     list_display = ('batch', 'count', 'reason', 'approved', 'approved_by', 'created_at')
+    list_select_related = ('batch', 'approved_by')
     actions = [approve_mortalities]
 
     # You can still edit count/reason normally; approval is done via action only
@@ -132,3 +196,4 @@ class MortalityAdmin(admin.ModelAdmin):
 @admin.register(ShopItem)
 class ShopItemAdmin(admin.ModelAdmin):
     list_display = ('batch', 'selling_price_per_unit', 'created_at')
+    list_select_related = ('batch',)
@@ -0,0 +1,137 @@
+"""
+Async read endpoints for serving under ASGI (see README, "Async serving").
+
+They mirror the list/detail reads of BatchViewSet, MortalityViewSet and
+ShopItemViewSet with the same payloads, keyset pagination and ETags, but
+query through Django's async ORM so a worker keeps serving other requests
+while one waits on the database.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from . import cache
+from .authentication import CachedJWTAuthentication
+from .filters import BatchFilter, MortalityFilter
+from .models import Batch, MortalityRecord, ShopItem
+from .pagination import BatchPagination, MortalityPagination, ShopPagination
+from .serializers import BatchSerializer, MortalityRecordSerializer, ShopItemSerializer
+
+_authenticator = CachedJWTAuthentication()
+
+
+def api_response(data, status=200, etag=None):
+    response = JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+    if etag:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def async_api(staff_only=False):
+    """Authenticate the JWT (off the event loop) and apply the viewset's permission rule."""
+    def decorator(view):
+        @require_GET
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                result = await sync_to_async(_authenticator.authenticate)(request)
+            except AuthenticationFailed as exc:
+                response = api_response({'detail': exc.detail}, status=401)
+                response['WWW-Authenticate'] = _authenticator.authenticate_header(request)
+                return response
+            if result is None:
+                response = api_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+                response['WWW-Authenticate'] = _authenticator.authenticate_header(request)
+                return response
+
+            request.user = result[0]
+            if staff_only and not request.user.is_staff:
+                return api_response({'detail': 'You do not have permission to perform this action.'}, status=403)
+            try:
+                return await view(Request(request), *args, **kwargs)
+            except APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return api_response(data, status=exc.status_code)
+        return wrapper
+    return decorator
+
+
+def filtered(filterset_class, queryset, request):
+    # Same validation as DjangoFilterBackend; filters never query, so this stays sync
+    filterset = filterset_class(request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+async def paginate(paginator, queryset, request):
+    rows = [row async for row in paginator.page_queryset(queryset, request)]
+    return paginator.finish_page(rows)
+
+
+async def batch_payloads(stubs):
+    payloads = cache.get_payloads(stubs)
+    missing = [stub.pk for stub in stubs if stub.pk not in payloads]
+    if missing:
+        queryset = Batch.objects.select_related('animal').with_costs().filter(pk__in=missing)
+        fresh = [obj async for obj in queryset]
+        for obj in fresh:
+            payloads[obj.pk] = BatchSerializer(obj).data
+        cache.store_payloads(fresh, payloads)
+    return [payloads[stub.pk] for stub in stubs if stub.pk in payloads]
+
+
+@async_api()
+async def batch_list(request):
+    paginator = BatchPagination()
+    stubs = Batch.objects.only('id', 'version', 'arrival_date')
+    stubs = await paginate(paginator, filtered(BatchFilter, stubs, request), request)
+
+    etag = cache.list_etag(request, stubs)
+    if cache.etag_matches(request, etag):
+        return not_modified(etag)
+    return api_response(paginator.get_paginated_data(await batch_payloads(stubs)), etag=etag)
+
+
+@async_api()
+async def batch_detail(request, pk):
+    stub = await Batch.objects.only('id', 'version').filter(pk=pk).afirst()
+    if stub is None:
+        return api_response({'detail': 'No Batch matches the given query.'}, status=404)
+
+    etag = cache.detail_etag(stub.pk, stub.version)
+    if cache.etag_matches(request, etag):
+        return not_modified(etag)
+    data = await batch_payloads([stub])
+    if not data:
+        return api_response({'detail': 'No Batch matches the given query.'}, status=404)
+    return api_response(data[0], etag=etag)
+
+
+@async_api()
+async def mortality_list(request):
+    paginator = MortalityPagination()
+    queryset = filtered(MortalityFilter, MortalityRecord.objects.select_related('approved_by'), request)
+    rows = await paginate(paginator, queryset, request)
+    return api_response(paginator.get_paginated_data(MortalityRecordSerializer(rows, many=True).data))
+
+
+@async_api(staff_only=True)
+async def shop_list(request):
+    paginator = ShopPagination()
+    rows = await paginate(paginator, ShopItem.objects.all(), request)
+    return api_response(paginator.get_paginated_data(ShopItemSerializer(rows, many=True).data))
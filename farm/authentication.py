@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+AUTH_CACHE_ALIAS = 'auth'
+
+
+def user_cache_key(user_id):
+    return f'jwt-user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop a cached user; called whenever the user row is saved or deleted."""
+    caches[AUTH_CACHE_ALIAS].delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user from a short-TTL cache shared by
+    every worker instead of loading the row on every request. Cached users are
+    re-checked against the token on each hit (active flag, and the
+    password-hash claim that versions tokens when CHECK_REVOKE_TOKEN is on).
+    Any user save or delete, in whichever process, evicts the entry for all
+    workers; JWT_USER_CACHE_TTL only bounds writes that bypass the model
+    signals, such as queryset.update().
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache = caches[AUTH_CACHE_ALIAS]
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.JWT_USER_CACHE_TTL)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
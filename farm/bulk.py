@@ -0,0 +1,158 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Batch, Expense, FeedingRecord, MortalityRecord, SyncReceipt
+from .serializers import ExpenseSerializer, FeedingRecordSerializer, MortalityRecordSerializer
+
+MAX_BULK_RECORDS = 500
+
+# record type -> serializer used to validate it
+RECORD_SERIALIZERS = {
+    'expense': ExpenseSerializer,
+    'feeding': FeedingRecordSerializer,
+    'mortality': MortalityRecordSerializer,
+}
+
+
+def _batch_ids(items):
+    ids = set()
+    for item in items:
+        try:
+            ids.add(int(item.get('batch')))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return ids
+
+
+def validate_records(items):
+    """
+    Validate a mixed list of records against one preloaded batch map.
+    Returns ``(results, pending)``: a result slot per item (errors filled in)
+    and ``(index, record_type, model_instance)`` for every valid item.
+    """
+    batches = Batch.objects.in_bulk(_batch_ids(items))
+    results = [None] * len(items)
+    pending = []
+
+    for index, item in enumerate(items):
+        record_type = item.get('type') if isinstance(item, dict) else None
+        serializer_class = RECORD_SERIALIZERS.get(record_type)
+        if serializer_class is None:
+            results[index] = {
+                'index': index, 'status': 'invalid',
+                'errors': {'type': [f"must be one of: {', '.join(RECORD_SERIALIZERS)}"]},
+            }
+            continue
+
+        serializer = serializer_class(data=item, context={'batches': batches})
+        if not serializer.is_valid():
+            results[index] = {'index': index, 'type': record_type, 'status': 'invalid', 'errors': serializer.errors}
+            continue
+
+        pending.append((index, record_type, serializer_class.Meta.model(**serializer.validated_data)))
+
+    return results, pending
+
+
+@transaction.atomic
+def insert_records(pending, user):
+    """Insert validated records with one bulk_create per type and post their costs to the ledger."""
+    by_model = defaultdict(list)
+    for _, _, obj in pending:
+        if not isinstance(obj, MortalityRecord):
+            obj.recorded_by = user
+        by_model[type(obj)].append(obj)
+
+    for model, objs in by_model.items():
+        model.objects.bulk_create(objs)
+
+    # bulk_create skips save(), so post the ledger deltas of all batches here at once
+    deltas = defaultdict(lambda: {'expenses': Decimal('0.00'), 'feed': Decimal('0.00'), 'bags': 0})
+    for obj in by_model[Expense] + by_model[FeedingRecord]:
+        for key, value in obj.ledger_values().items():
+            deltas[obj.batch_id][key] += value
+    Batch.objects.apply_costs(deltas)
+
+    # apply_costs already bumped the versions of batches with cost records
+    mortality_only = {obj.batch_id for obj in by_model[MortalityRecord]} - set(deltas)
+    if mortality_only:
+        Batch.objects.filter(pk__in=mortality_only).touch()
+
+
+def ingest_records(items, user):
+    """Validate and insert a mixed list of expense/feeding/mortality records; returns per-item results."""
+    results, pending = validate_records(items)
+    if pending:
+        insert_records(pending, user)
+    for index, record_type, obj in pending:
+        results[index] = {'index': index, 'type': record_type, 'status': 'created', 'id': obj.pk}
+    return results
+
+
+def _parse_key(item):
+    try:
+        return uuid.UUID(str(item.get('key')))
+    except (AttributeError, ValueError):
+        return None
+
+
+def sync_records(items, user):
+    """
+    Idempotent variant of ingest_records for the offline client queue.
+    Every item carries a client-generated UUID ``key``; keys this user has
+    already sent (earlier requests or earlier in this payload) come back as ``duplicate``
+    with the id of the row they created instead of inserting again.
+    """
+    results = [None] * len(items)
+    keys = {}
+    for index, item in enumerate(items):
+        key = _parse_key(item)
+        if key is None:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': {'key': ['a UUID is required']}}
+        else:
+            keys[index] = key
+
+    receipts = {r.key: r for r in SyncReceipt.objects.filter(user=user, key__in=set(keys.values()))}
+    fresh, seen = [], {}
+    for index, key in keys.items():
+        if key in receipts:
+            receipt = receipts[key]
+            results[index] = {'index': index, 'key': str(key), 'type': receipt.record_type,
+                              'status': 'duplicate', 'id': receipt.object_id}
+        elif key in seen:
+            results[index] = {'index': index, 'key': str(key), 'status': 'duplicate', 'of': seen[key]}
+        else:
+            seen[key] = index
+            fresh.append(index)
+
+    checked, pending = validate_records([items[i] for i in fresh])
+    for position, result in enumerate(checked):
+        if result is not None:
+            index = fresh[position]
+            results[index] = dict(result, index=index, key=str(keys[index]))
+
+    if pending:
+        # A concurrent request replaying the same key trips the unique index and rolls this one back
+        with transaction.atomic():
+            insert_records(pending, user)
+            SyncReceipt.objects.bulk_create([
+                SyncReceipt(key=keys[fresh[position]], record_type=record_type, object_id=obj.pk, user=user)
+                for position, record_type, obj in pending
+            ])
+
+    for position, record_type, obj in pending:
+        index = fresh[position]
+        results[index] = {'index': index, 'key': str(keys[index]), 'type': record_type,
+                          'status': 'created', 'id': obj.pk}
+
+    # Duplicates inside the payload report the outcome of their first occurrence
+    for result in results:
+        if 'of' in result:
+            first = results[result.pop('of')]
+            result.update(type=first.get('type'), id=first.get('id'))
+            if first['status'] == 'invalid':
+                result.update(status='invalid', errors=first['errors'])
+    return results
@@ -0,0 +1,78 @@
+import hashlib
+
+from django.core.cache import caches
+from django.utils.http import parse_etags, quote_etag
+
+BATCH_CACHE_ALIAS = 'batches'
+
+
+def batch_cache():
+    return caches[BATCH_CACHE_ALIAS]
+
+
+# Public shop catalog snapshot. Writers drop it and set a fresh one after
+# commit; readers only add() on a miss, so a snapshot read before a commit
+# can never replace the one built after it. With per-process LocMemCache the
+# timeout bounds how long other workers serve a superseded snapshot.
+CATALOG_KEY = 'shop:catalog'
+CATALOG_TIMEOUT = 60
+
+
+def get_catalog():
+    return batch_cache().get(CATALOG_KEY)
+
+
+def add_catalog(catalog):
+    batch_cache().add(CATALOG_KEY, catalog, CATALOG_TIMEOUT)
+
+
+def store_catalog(catalog):
+    batch_cache().set(CATALOG_KEY, catalog, CATALOG_TIMEOUT)
+
+
+def forget_catalog():
+    batch_cache().delete(CATALOG_KEY)
+
+
+def fields_variant(fields):
+    """Short name for a sparse field selection; '' for the full representation."""
+    if fields is None:
+        return ''
+    return hashlib.sha1(','.join(sorted(fields)).encode()).hexdigest()[:12]
+
+
+def payload_key(pk, version, variant=''):
+    # Versioned keys never need invalidating; superseded entries age out of the LRU.
+    # ``variant`` names a sparse field selection, cached apart from the full payload.
+    key = f'batch:{pk}:v{version}'
+    return f'{key}:{variant}' if variant else key
+
+
+def get_payloads(rows, variant=''):
+    """Cached serialized payloads for ``rows`` (objects with ``pk`` and ``version``), keyed by pk."""
+    keys = {payload_key(row.pk, row.version, variant): row.pk for row in rows}
+    found = batch_cache().get_many(list(keys))
+    return {keys[key]: payload for key, payload in found.items()}
+
+
+def store_payloads(objs, payloads, variant=''):
+    batch_cache().set_many({payload_key(obj.pk, obj.version, variant): payloads[obj.pk] for obj in objs})
+
+
+def detail_etag(pk, version, variant=''):
+    return quote_etag(f'b{pk}-v{version}-{variant}' if variant else f'b{pk}-v{version}')
+
+
+def list_etag(request, rows):
+    digest = hashlib.sha1(request.get_full_path().encode())
+    for row in rows:
+        digest.update(f'|{row.pk}:{row.version}'.encode())
+    return quote_etag(f'bl-{digest.hexdigest()}')
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return '*' in tags or etag in tags or etag in [t.removeprefix('W/') for t in tags]
@@ -0,0 +1,82 @@
+"""
+Streaming CSV / NDJSON exports. Rows are read as tuples with a chunked
+``.iterator()`` (a server-side cursor on PostgreSQL) and encoded one at a
+time into a StreamingHttpResponse, so memory stays flat however many rows
+match and the first bytes go out before the query has finished.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .filters import BatchFilter, ExpenseFilter, FeedingRecordFilter, MortalityFilter
+from .models import Batch, Expense, FeedingRecord, MortalityRecord
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# kind: (model, filterset, [(column, ORM path)])
+EXPORTS = {
+    'batches': (Batch, BatchFilter, [
+        ('id', 'id'), ('serial_number', 'serial_number'), ('animal', 'animal__code'),
+        ('arrival_date', 'arrival_date'), ('initial_quantity', 'initial_quantity'),
+        ('current_quantity', 'current_quantity'), ('is_moved_to_shop', 'is_moved_to_shop'),
+        ('expenses_total', 'expenses_total'), ('feed_total', 'feed_total'), ('feed_bags_total', 'feed_bags_total'),
+        ('locked_unit_cost', 'locked_unit_cost'), ('created_at', 'created_at'),
+    ]),
+    'expenses': (Expense, ExpenseFilter, [
+        ('id', 'id'), ('batch', 'batch_id'), ('serial_number', 'batch__serial_number'),
+        ('animal', 'batch__animal__code'), ('description', 'description'), ('amount', 'amount'),
+        ('recorded_by', 'recorded_by__username'), ('created_at', 'created_at'),
+    ]),
+    'feedings': (FeedingRecord, FeedingRecordFilter, [
+        ('id', 'id'), ('batch', 'batch_id'), ('serial_number', 'batch__serial_number'),
+        ('animal', 'batch__animal__code'), ('bags', 'bags'), ('amount', 'amount'), ('note', 'note'),
+        ('recorded_by', 'recorded_by__username'), ('created_at', 'created_at'),
+    ]),
+    'mortalities': (MortalityRecord, MortalityFilter, [
+        ('id', 'id'), ('batch', 'batch_id'), ('serial_number', 'batch__serial_number'),
+        ('animal', 'batch__animal__code'), ('count', 'count'), ('reason', 'reason'),
+        ('approved', 'approved'), ('approved_by', 'approved_by__username'),
+        ('approved_at', 'approved_at'), ('created_at', 'created_at'),
+    ]),
+}
+
+
+class Echo:
+    """File-like object whose write() hands the encoded line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, columns):
+    paths = [path for _, path in columns]
+    # Oldest first, by primary key: a plain index order the cursor can walk
+    return queryset.order_by('pk').values_list(*paths).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(columns, rows):
+    names = [name for name, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def streaming_export(kind, fmt, queryset, filename):
+    columns = EXPORTS[kind][2]
+    rows = export_rows(queryset, columns)
+    lines = csv_lines(columns, rows) if fmt == 'csv' else ndjson_lines(columns, rows)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,46 @@
+"""
+Query-string filters for the list endpoints.
+
+Foreign keys are filtered by raw id (NumberFilter on ``<fk>_id``) rather than
+ModelChoiceFilter, so validating a filter never costs a lookup query; date
+ranges on timestamps become ``created_at`` bounds at local midnight, which the
+(batch, created_at) indexes can range-scan, instead of ``__date`` casts.
+"""
+from django_filters import rest_framework as filters
+
+from .models import Batch, Expense, FeedingRecord, MortalityRecord
+
+
+class BatchFilter(filters.FilterSet):
+    animal = filters.NumberFilter(field_name='animal_id')
+    # ?arrival_after=YYYY-MM-DD&arrival_before=YYYY-MM-DD (inclusive)
+    arrival = filters.DateFromToRangeFilter(field_name='arrival_date')
+
+    class Meta:
+        model = Batch
+        fields = ['animal', 'arrival', 'is_moved_to_shop']
+
+
+class BatchRecordFilter(filters.FilterSet):
+    """Shared by the child record lists: ``?batch=<id>&animal=<id>&created_after=&created_before=``."""
+    batch = filters.NumberFilter(field_name='batch_id')
+    animal = filters.NumberFilter(field_name='batch__animal_id')
+    created = filters.DateFromToRangeFilter(field_name='created_at')
+
+
+class MortalityFilter(BatchRecordFilter):
+    class Meta:
+        model = MortalityRecord
+        fields = ['batch', 'animal', 'approved', 'created']
+
+
+class ExpenseFilter(BatchRecordFilter):
+    class Meta:
+        model = Expense
+        fields = ['batch', 'animal', 'created']
+
+
+class FeedingRecordFilter(BatchRecordFilter):
+    class Meta:
+        model = FeedingRecord
+        fields = ['batch', 'animal', 'created']
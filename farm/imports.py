@@ -0,0 +1,240 @@
+"""
+Bulk import of historical records from CSV, one table per file.
+
+The file is read row by row and handled in chunks: each chunk is validated
+against in-memory lookup maps (animal type codes, batch serial numbers),
+inserted with bulk_create through the same ledger, summary and version hooks
+as the bulk API, and committed on its own. A failed run keeps every chunk
+before the failure and can be resumed from the first uncommitted line.
+Column names match the CSV exports, so an export can be imported elsewhere.
+"""
+import csv
+from collections import defaultdict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import insert_records
+from .models import (AnimalType, Batch, BatchDailySnapshot, MonthlyAnimalSummary, MortalityRecord, SerialCounter,
+                     month_start)
+from .exports import EXPORTS
+
+IMPORT_CHUNK_SIZE = 2000
+
+# kind: (required columns, optional columns). ``animal`` is an AnimalType code;
+# on the record files ``serial_number`` names the batch the row belongs to.
+# Derived columns of an export (ledger totals, current_quantity, ids) are ignored.
+IMPORT_COLUMNS = {
+    'batches': (['animal', 'arrival_date', 'initial_quantity'], ['serial_number', 'created_at']),
+    'expenses': (['serial_number', 'description', 'amount'], ['created_at']),
+    'feedings': (['serial_number', 'amount'], ['bags', 'note', 'created_at']),
+    'mortalities': (['serial_number', 'count'], ['reason', 'approved', 'approved_at', 'created_at']),
+}
+# import kind -> record type understood by bulk.insert_records
+RECORD_TYPES = {'expenses': 'expense', 'feedings': 'feeding', 'mortalities': 'mortality'}
+
+
+class ImportInterrupted(Exception):
+    """A chunk failed after earlier ones were committed; the import can resume at ``resume_line``."""
+
+    def __init__(self, cause, resume_line):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.resume_line = resume_line
+
+
+def write_error_report(errors, out):
+    """Write ``(line, {column: [messages]})`` rejections as CSV rows of line, column and message."""
+    writer = csv.writer(out)
+    writer.writerow(['line', 'column', 'message'])
+    for line, problems in errors:
+        for column, messages in problems.items():
+            for message in messages:
+                writer.writerow([line, column, message])
+
+
+class CsvImporter:
+    """
+    Imports one CSV file of ``kind`` rows. After run(), ``created`` is the
+    number of rows inserted, ``errors`` lists ``(line, {column: [messages]})``
+    for every rejected row and ``last_line`` is the last committed line.
+    """
+
+    def __init__(self, kind, user=None, chunk_size=IMPORT_CHUNK_SIZE):
+        self.kind = kind
+        self.model = EXPORTS[kind][0]
+        self.required, self.optional = IMPORT_COLUMNS[kind]
+        self.user = user
+        self.chunk_size = chunk_size
+        self.animals = dict(AnimalType.objects.values_list('code', 'pk'))
+        # serial number -> batch id, filled one query per chunk as new serials turn up
+        self.batches = {}
+        # batch id -> first day touched, to refresh the daily snapshots at the end
+        self.starts = {}
+        self.created = 0
+        self.errors = []
+        self.last_line = None
+
+    def run(self, lines, start_line=None):
+        """Import the rows of an iterable of CSV lines, skipping those before ``start_line``."""
+        reader = csv.DictReader(lines)
+        missing = [column for column in self.required if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"missing column(s): {', '.join(missing)}")
+
+        chunk = []
+        try:
+            for row in reader:
+                if start_line and reader.line_num < start_line:
+                    continue
+                chunk.append((reader.line_num, row))
+                if len(chunk) >= self.chunk_size:
+                    self.import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk)
+        except Exception as exc:
+            if self.last_line is None:
+                raise
+            raise ImportInterrupted(exc, self.last_line + 1) from exc
+        self.refresh_snapshots()
+        return self
+
+    def import_chunk(self, chunk):
+        rows = []
+        for line, row in chunk:
+            values, errors = self.clean_row(row)
+            if errors:
+                self.errors.append((line, errors))
+            else:
+                rows.append((line, values))
+        with transaction.atomic():
+            if rows:
+                self.created += self.insert_batches(rows) if self.kind == 'batches' else self.insert_records(rows)
+        self.last_line = chunk[-1][0]
+
+    def clean_row(self, row):
+        values, errors = {}, {}
+        for column in self.required + self.optional:
+            raw = (row.get(column) or '').strip()
+            if not raw:
+                if column in self.required:
+                    errors[column] = ['This field is required.']
+                continue
+            try:
+                values[column] = self.clean_value(column, raw)
+            except ValidationError as exc:
+                errors[column] = exc.messages
+        return values, errors
+
+    def clean_value(self, column, raw):
+        if column == 'animal':
+            if raw not in self.animals:
+                raise ValidationError(f'Unknown animal type "{raw}".')
+            return self.animals[raw]
+        if column == 'serial_number':
+            # Checked against the batch column on every kind, so an overlong serial is a bad row, not a DB error
+            return Batch._meta.get_field('serial_number').clean(raw, None)
+        value = self.model._meta.get_field(column).clean(raw, None)
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def mark(self, batch_id, day):
+        if batch_id not in self.starts or day < self.starts[batch_id]:
+            self.starts[batch_id] = day
+
+    def insert_batches(self, rows):
+        # Counters move past the hand-written serials first, so none is handed out again below
+        SerialCounter.objects.observe([values['serial_number'] for _, values in rows if 'serial_number' in values])
+        # One counter upsert per arrival day for the rows without a serial
+        unnamed = defaultdict(list)
+        for _, values in rows:
+            if 'serial_number' not in values:
+                unnamed[values['arrival_date']].append(values)
+        for day, group in unnamed.items():
+            for values, serial in zip(group, SerialCounter.objects.allocate(day, len(group))):
+                values['serial_number'] = serial
+        taken = set(Batch.objects.filter(serial_number__in=[values['serial_number'] for _, values in rows])
+                    .values_list('serial_number', flat=True))
+
+        batches, stamps = [], []
+        for line, values in rows:
+            serial = values['serial_number']
+            if serial in taken:
+                self.errors.append((line, {'serial_number': [f'Batch "{serial}" already exists.']}))
+                continue
+            taken.add(serial)
+            created_at = values.pop('created_at', None)
+            batch = Batch(animal_id=values.pop('animal'), current_quantity=values['initial_quantity'], **values)
+            batches.append(batch)
+            stamps.append(created_at)
+
+        # bulk_create skips Batch.save(), so add the cohorts to the monthly summary here
+        Batch.objects.bulk_create(batches)
+        cohorts = {}
+        for batch in batches:
+            totals = cohorts.setdefault((batch.animal_id, month_start(batch.arrival_date)),
+                                        {'batch_count': 0, 'heads_in': 0})
+            totals['batch_count'] += 1
+            totals['heads_in'] += batch.initial_quantity
+            self.batches[batch.serial_number] = batch.pk
+            self.mark(batch.pk, batch.arrival_date)
+        MonthlyAnimalSummary.objects.apply_deltas(cohorts)
+        self.restore(batches, [{'created_at': stamp} for stamp in stamps])
+        return len(batches)
+
+    def insert_records(self, rows):
+        unknown = {values['serial_number'] for _, values in rows} - set(self.batches)
+        if unknown:
+            self.batches.update(Batch.objects.filter(serial_number__in=unknown).values_list('serial_number', 'pk'))
+
+        pending, stamps, approved = [], [], []
+        now = timezone.now()
+        for line, values in rows:
+            serial = values.pop('serial_number')
+            if serial not in self.batches:
+                self.errors.append((line, {'serial_number': [f'Batch "{serial}" does not exist.']}))
+                continue
+            created_at = values.pop('created_at', None)
+            stamp = {'created_at': created_at}
+            record = self.model(batch_id=self.batches[serial], **{
+                field: value for field, value in values.items() if field not in ('approved', 'approved_at')})
+            if values.get('approved'):
+                approved.append(record)
+                stamp['approved_at'] = values.get('approved_at') or created_at
+            pending.append((line, RECORD_TYPES[self.kind], record))
+            stamps.append(stamp)
+            self.mark(record.batch_id, timezone.localdate(stamp.get('approved_at') or created_at or now))
+
+        if pending:
+            # Inserted as reported, then approved, so the headcount and deaths follow the normal path
+            insert_records(pending, self.user)
+            if approved:
+                MortalityRecord.objects.filter(pk__in=[record.pk for record in approved]).approve(self.user)
+            self.restore([record for _, _, record in pending], stamps)
+        return len(pending)
+
+    def restore(self, objs, stamps):
+        """
+        auto_now_add overwrites created_at in bulk_create (and approve() stamps
+        approved_at with now), so write the imported timestamps back afterwards.
+        """
+        changed, fields = [], set()
+        for obj, stamp in zip(objs, stamps):
+            stamp = {field: value for field, value in stamp.items() if value is not None}
+            if stamp:
+                for field, value in stamp.items():
+                    setattr(obj, field, value)
+                changed.append(obj)
+                fields.update(stamp)
+        if changed:
+            type(changed[0]).objects.bulk_update(changed, sorted(fields))
+
+    def refresh_snapshots(self, chunk_size=500):
+        # Imported rows are backdated, so the incremental snapshot run would not see them
+        starts = sorted(self.starts.items())
+        for i in range(0, len(starts), chunk_size):
+            BatchDailySnapshot.objects.refresh(dict(starts[i:i + chunk_size]))
@@ -0,0 +1,120 @@
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from farm.cache import BATCH_CACHE_ALIAS
+from farm.models import Batch
+
+ENDPOINTS = [
+    ('batch-list', '/api/batches/'),
+    ('batch-list-large-page', '/api/batches/?page_size=100'),
+    ('batch-detail', '/api/batches/{batch}/'),
+    ('mortality-list', '/api/mortalities/'),
+    ('shop-list', '/api/shop/'),
+    ('analytics-monthly', '/api/analytics/monthly/'),
+    ('async-batch-list', '/api/async/batches/'),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Call the main API endpoints in-process through the test client and report "
+            "p50/p95/p99 latency and queries per request")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--user', help="Username to authenticate as (default: first superuser)")
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help="Only run the named endpoint(s); repeatable")
+        parser.add_argument('--cold', action='store_true',
+                            help="Clear the batch payload cache before every request")
+        parser.add_argument('--output', help="Write results to this JSON file")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1")
+        User = get_user_model()
+        users = User.objects.filter(username=options['user']) if options['user'] else \
+            User.objects.filter(is_superuser=True).order_by('pk')
+        user = users.first()
+        if user is None:
+            raise CommandError("No user to authenticate as; pass --user or create a superuser")
+
+        batch = Batch.objects.order_by('-arrival_date', '-id').values_list('pk', flat=True).first()
+        endpoints = [(name, path) for name, path in ENDPOINTS
+                     if not options['endpoints'] or name in options['endpoints']]
+        if batch is None:
+            endpoints = [(name, path) for name, path in endpoints if '{batch}' not in path]
+
+        client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        results = {}
+        for name, path in endpoints:
+            path = path.format(batch=batch)
+            for _ in range(options['warmup']):
+                client.get(path, secure=True)
+
+            timings, queries, status = [], [], None
+            for _ in range(options['iterations']):
+                if options['cold']:
+                    caches[BATCH_CACHE_ALIAS].clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = client.get(path, secure=True)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries.append(len(ctx.captured_queries))
+                status = response.status_code
+
+            timings.sort()
+            results[name] = {
+                'path': path,
+                'status': status,
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'queries_per_request': round(sum(queries) / len(queries), 2),
+            }
+            r = results[name]
+            self.stdout.write(
+                f"{name:<24} {status}  p50 {r['p50_ms']:>8.2f}ms  p95 {r['p95_ms']:>8.2f}ms  "
+                f"p99 {r['p99_ms']:>8.2f}ms  queries {r['queries_per_request']}"
+            )
+
+        if options['output']:
+            report = {
+                'commit': current_commit(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'batches': Batch.objects.count(),
+                'iterations': options['iterations'],
+                'cold_cache': options['cold'],
+                'endpoints': results,
+            }
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
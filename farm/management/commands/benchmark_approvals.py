@@ -0,0 +1,84 @@
+import threading
+import time
+import uuid
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from farm.models import AnimalType, Batch, MortalityRecord
+
+from .benchmark_api import percentile
+
+
+class Command(BaseCommand):
+    help = ("Approve pending mortality records on one hot batch from many concurrent approvers "
+            "and report throughput; run against PostgreSQL for meaningful numbers")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--approvers', type=int, default=16, help="Concurrent approver threads")
+        parser.add_argument('--records', type=int, default=2000, help="Pending records on the batch")
+        parser.add_argument('--overlap', type=int, default=2,
+                            help="Approvers that try every record (2+ exercises the lost-race path)")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark batch afterwards")
+
+    def handle(self, *args, **options):
+        approvers, records, overlap = options['approvers'], options['records'], options['overlap']
+        if approvers < 1 or records < 1 or not 1 <= overlap <= approvers:
+            raise CommandError("--approvers and --records must be positive and --overlap between 1 and --approvers")
+        if connection.vendor == 'sqlite':
+            self.stderr.write("SQLite serialises all writers; expect lock errors and no real concurrency")
+
+        approver = get_user_model().objects.filter(is_superuser=True).order_by('pk').first()
+        animal, _ = AnimalType.objects.get_or_create(code='benchmark', defaults={'name': 'Benchmark'})
+        batch = Batch.objects.create(animal=animal, arrival_date=date.today(), initial_quantity=records * 2,
+                                     serial_number=f"BENCH-{uuid.uuid4().hex[:8]}")
+        MortalityRecord.objects.bulk_create([MortalityRecord(batch=batch, count=1) for _ in range(records)])
+        ids = list(batch.mortalities.order_by('pk').values_list('pk', flat=True))
+
+        # Approver i takes every record whose position falls in its share; with overlap > 1
+        # each record is attempted by that many approvers and only one may win it
+        shares = [[pk for n, pk in enumerate(ids) if (n - i) % approvers < overlap] for i in range(approvers)]
+        won, failed, latencies = [0] * approvers, [0] * approvers, [[] for _ in range(approvers)]
+        start = threading.Barrier(approvers + 1)
+
+        def run(i):
+            try:
+                start.wait()
+                for pk in shares[i]:
+                    began = time.perf_counter()
+                    try:
+                        if MortalityRecord.objects.get(pk=pk).approve(approver):
+                            won[i] += 1
+                    except Exception:
+                        failed[i] += 1
+                    latencies[i].append(time.perf_counter() - began)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(approvers)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        batch.refresh_from_db()
+        approved = sum(won)
+        attempts = sorted(latency for per_thread in latencies for latency in per_thread)
+        consistent = (approved == batch.mortalities.filter(approved=True).count()
+                      and batch.current_quantity == records * 2 - approved)
+        self.stdout.write(
+            f"{approvers} approvers, {len(attempts)} attempts on {records} records in {elapsed:.2f}s: "
+            f"{approved / elapsed:.0f} approvals/s, {len(attempts) / elapsed:.0f} attempts/s, "
+            f"p50 {percentile(attempts, 50) * 1000:.1f}ms, p99 {percentile(attempts, 99) * 1000:.1f}ms, "
+            f"{sum(failed)} error(s)"
+        )
+        if not options['keep']:
+            batch.delete()
+        if not consistent:
+            raise CommandError(f"Headcount drifted: {batch.current_quantity} left after {approved} approvals")
+        self.stdout.write(self.style.SUCCESS("Headcount matches the approved records"))
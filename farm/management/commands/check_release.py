@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.release import ensure_release
+
+
+class Command(BaseCommand):
+    help = "Verify that migrations are applied and the static manifest is current, without redoing either"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true',
+                            help="Run migrate and/or collectstatic, but only for whatever is out of date")
+
+    def handle(self, *args, **options):
+        migrations, static = ensure_release(apply=options['apply'], stdout=self.stdout)
+        for name in migrations:
+            self.stdout.write(f"unapplied migration: {name}")
+        for path in static[:20]:
+            self.stdout.write(f"stale static file: {path}")
+        if len(static) > 20:
+            self.stdout.write(f"... and {len(static) - 20} more static file(s)")
+
+        if not migrations and not static:
+            self.stdout.write(self.style.SUCCESS("Release is current"))
+        elif options['apply']:
+            self.stdout.write(self.style.SUCCESS("Applied the missing release steps"))
+        else:
+            raise CommandError(f"{len(migrations)} unapplied migration(s), {len(static)} stale static file(s)")
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from farm.imports import IMPORT_CHUNK_SIZE, IMPORT_COLUMNS, CsvImporter, ImportInterrupted, write_error_report
+
+
+class Command(BaseCommand):
+    help = ("Import historical batches, expenses, feedings or mortalities from a CSV file "
+            "(same columns as the CSV export), committing one chunk at a time")
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORT_COLUMNS))
+        parser.add_argument('path')
+        parser.add_argument('--user', help="Username recorded as the author/approver of imported rows")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--start-line', type=int,
+                            help="Skip rows before this line of the file (to resume an interrupted import)")
+        parser.add_argument('--errors', help="Write rejected rows to this CSV file (line, column, message)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        importer = CsvImporter(options['kind'], user=user, chunk_size=options['chunk_size'])
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as source:
+                importer.run(source, start_line=options['start_line'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        except ImportInterrupted as exc:
+            raise CommandError(
+                f"{exc}\nRows up to line {exc.resume_line - 1} are committed; "
+                f"rerun with --start-line {exc.resume_line} to continue."
+            ) from exc.cause
+        finally:
+            self.report_errors(importer, options['errors'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.created} {options['kind']} row(s), rejected {len(importer.errors)}"
+        ))
+
+    def report_errors(self, importer, path):
+        if path:
+            with open(path, 'w', newline='', encoding='utf-8') as out:
+                write_error_report(importer.errors, out)
+        for line, errors in importer.errors[:20]:
+            details = '; '.join(f"{column}: {' '.join(messages)}" for column, messages in errors.items())
+            self.stderr.write(f"line {line}: {details}")
+        if len(importer.errors) > 20:
+            self.stderr.write(f"... and {len(importer.errors) - 20} more rejected row(s)")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from farm.models import MonthlyAnimalSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly per-animal analytics summary from scratch"
+
+    def handle(self, *args, **options):
+        rows = MonthlyAnimalSummary.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} monthly summary row(s)"))
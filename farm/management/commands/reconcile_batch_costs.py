@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from farm.models import Batch, MonthlyAnimalSummary
+
+
+class Command(BaseCommand):
+    help = "Verify batch running cost totals against the expense/feeding tables and rebuild any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drift; exit non-zero instead of rebuilding")
+
+    def handle(self, *args, **options):
+        drifted = []
+        rows = Batch.objects.with_actual_costs().values_list(
+            'pk', 'serial_number',
+            'expenses_total', 'feed_total', 'feed_bags_total',
+            'actual_expenses', 'actual_feed', 'actual_bags',
+        )
+        for pk, serial, expenses, feed, bags, actual_expenses, actual_feed, actual_bags in rows.iterator():
+            if (expenses, feed, bags) != (actual_expenses, actual_feed, actual_bags):
+                drifted.append(pk)
+                self.stdout.write(
+                    f"{serial}: stored expenses={expenses} feed={feed} bags={bags}, "
+                    f"actual expenses={actual_expenses} feed={actual_feed} bags={actual_bags}"
+                )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All batch cost totals are consistent"))
+            return
+
+        if options['check']:
+            raise CommandError(f"{len(drifted)} batch(es) have drifted cost totals")
+
+        with transaction.atomic():
+            Batch.objects.filter(pk__in=drifted).rebuild_costs()
+            # The monthly summary was fed the same drifted deltas
+            MonthlyAnimalSummary.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt cost totals for {len(drifted)} batch(es)"))
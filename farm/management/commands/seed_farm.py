@@ -0,0 +1,99 @@
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from farm.models import AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, MonthlyAnimalSummary
+
+ANIMAL_TYPES = [
+    ('broiler', 'Broiler'),
+    ('layer', 'Layer'),
+    ('catfish', 'Catfish'),
+    ('turkey', 'Turkey'),
+    ('pig', 'Pig'),
+    ('goat', 'Goat'),
+]
+EXPENSE_DESCRIPTIONS = ['vaccination', 'vet visit', 'litter', 'transport', 'medication', 'water treatment', 'labour']
+MORTALITY_REASONS = ['disease', 'heat stress', 'predator', 'injury', '']
+
+
+def money(low, high, rng):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+class Command(BaseCommand):
+    help = "Generate realistic volumes of batches and expense/feeding/mortality rows for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=2000)
+        parser.add_argument('--expenses', type=int, default=20000)
+        parser.add_argument('--feedings', type=int, default=30000)
+        parser.add_argument('--mortalities', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=730,
+                            help="Spread arrival dates over this many days back from today")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed, for repeatable data")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        chunk = options['chunk_size']
+        animals = [AnimalType.objects.get_or_create(code=code, defaults={'name': name})[0]
+                   for code, name in ANIMAL_TYPES]
+
+        # Build every row in memory first so the ledger columns and quantities
+        # can be written with the batch instead of patched afterwards
+        run = uuid.uuid4().hex[:6]
+        today = date.today()
+        batches = []
+        for index in range(options['batches']):
+            quantity = rng.randint(50, 2000)
+            arrival = today - timedelta(days=rng.randint(0, options['days']))
+            batches.append(Batch(
+                animal=rng.choice(animals), arrival_date=arrival, initial_quantity=quantity,
+                current_quantity=quantity, serial_number=f"SEED-{run}-{arrival:%Y%m%d}-{index:06d}",
+            ))
+        if not batches:
+            self.stdout.write("Nothing to seed")
+            return
+
+        expenses, feedings, mortalities = [], [], []
+        # Rows get created_at = now on insert; approved deaths are dated the same so snapshots count them
+        now = timezone.now()
+        for _ in range(options['expenses']):
+            batch = rng.choice(batches)
+            amount = money(5, 500, rng)
+            batch.expenses_total += amount
+            expenses.append(Expense(batch=batch, description=rng.choice(EXPENSE_DESCRIPTIONS), amount=amount))
+        for _ in range(options['feedings']):
+            batch = rng.choice(batches)
+            bags = rng.randint(1, 10)
+            amount = money(20, 45, rng) * bags
+            batch.feed_total += amount
+            batch.feed_bags_total += bags
+            feedings.append(FeedingRecord(batch=batch, bags=bags, amount=amount))
+        for _ in range(options['mortalities']):
+            batch = rng.choice(batches)
+            count = rng.randint(1, 5)
+            approved = rng.random() < 0.7 and batch.current_quantity >= count
+            if approved:
+                batch.current_quantity -= count
+            mortalities.append(MortalityRecord(batch=batch, count=count, approved=approved,
+                                               approved_at=now if approved else None,
+                                               reason=rng.choice(MORTALITY_REASONS)))
+
+        with transaction.atomic():
+            Batch.objects.bulk_create(batches, batch_size=chunk)
+            Expense.objects.bulk_create(expenses, batch_size=chunk)
+            FeedingRecord.objects.bulk_create(feedings, batch_size=chunk)
+            MortalityRecord.objects.bulk_create(mortalities, batch_size=chunk)
+            # bulk_create skips the per-row summary hooks; recompute it in one pass
+            MonthlyAnimalSummary.objects.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(batches)} batches, {len(expenses)} expenses, "
+            f"{len(feedings)} feeding records and {len(mortalities)} mortality records"
+        ))
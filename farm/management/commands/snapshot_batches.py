@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from farm.models import BatchDailySnapshot
+
+
+class Command(BaseCommand):
+    help = "Fill the daily per-batch snapshots, recomputing only batches and days with new activity"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recompute every batch from its arrival (after edits or deletes of old records)")
+        parser.add_argument('--overlap', type=int, default=300,
+                            help="Seconds to re-scan before the previous run, for writes that committed late")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        since = None
+        if not options['full']:
+            last_run = BatchDailySnapshot.objects.aggregate(last=Max('computed_at'))['last']
+            if last_run is not None:
+                since = last_run - timedelta(seconds=options['overlap'])
+
+        starts = sorted(BatchDailySnapshot.objects.stale_batches(since).items())
+        written = 0
+        for i in range(0, len(starts), options['chunk_size']):
+            written += BatchDailySnapshot.objects.refresh(dict(starts[i:i + options['chunk_size']]), computed_at=started)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} snapshot row(s) for {len(starts)} batch(es)"))
@@ -0,0 +1,142 @@
+"""
+Per-request performance instrumentation.
+
+RequestTimingMiddleware counts SQL queries and their time through a
+connection execute_wrapper, adds serializer time reported by
+TimedSerializerMixin, and returns all of it in a ``Server-Timing`` header.
+A sample of requests (PERF_LOG_SAMPLE_RATE) is logged to ``farm.perf`` as one
+JSON line; requests over PERF_SLOW_REQUEST_MS or PERF_QUERY_COUNT_THRESHOLD
+are always logged, with their slowest and repeated statements, so an N+1
+in a serializer shows up in production logs.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('farm.perf')
+
+_profile = ContextVar('farm_request_profile', default=None)
+_serializing = ContextVar('farm_serializing', default=False)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []  # (sql, seconds)
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for sql, duration in self.queries)
+
+    def slowest(self, limit):
+        ranked = sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+        return [{'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in ranked]
+
+    def duplicated(self, limit):
+        # Same statement text with different parameters: the shape of an N+1
+        counts = Counter(sql for sql, duration in self.queries)
+        return [{'sql': sql, 'count': count} for sql, count in counts.most_common(limit) if count > 1]
+
+
+@contextmanager
+def serializer_timing():
+    """Attribute the enclosed time to serialization; nested calls count once."""
+    profile = _profile.get()
+    if profile is None or _serializing.get():
+        yield
+        return
+    token = _serializing.set(True)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serializer_time += time.perf_counter() - start
+        _serializing.reset(token)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        with self.instrument(profile):
+            token = _profile.set(profile)
+            try:
+                response = self.get_response(request)
+            finally:
+                _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        with self.instrument(profile):
+            token = _profile.set(profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    @contextmanager
+    def instrument(self, profile):
+        with ExitStack() as stack:
+            # Wrapping only touches the connection handler; nothing is opened here
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            yield
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.started
+        db_time = profile.db_time
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_time * 1000:.1f};desc="{len(profile.queries)} queries"',
+            f'serialize;dur={profile.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        slow = (total * 1000 >= settings.PERF_SLOW_REQUEST_MS
+                or len(profile.queries) >= settings.PERF_QUERY_COUNT_THRESHOLD)
+        if not slow and random.random() >= settings.PERF_LOG_SAMPLE_RATE:
+            return response
+
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': len(profile.queries),
+            'db_ms': round(db_time * 1000, 2),
+            'serialize_ms': round(profile.serializer_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+        if slow:
+            limit = settings.PERF_CAPTURED_QUERIES
+            entry['slowest_queries'] = profile.slowest(limit)
+            entry['duplicated_queries'] = profile.duplicated(limit)
+            logger.warning(json.dumps(entry))
+        else:
+            logger.info(json.dumps(entry))
+        return response
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:17
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_ledger(apps, schema_editor):
+    Batch = apps.get_model("farm", "Batch")
+    Expense = apps.get_model("farm", "Expense")
+    FeedingRecord = apps.get_model("farm", "FeedingRecord")
+
+    def summed(model, field):
+        rows = (
+            model.objects.filter(batch=OuterRef("pk"))
+            .order_by()
+            .values("batch")
+            .annotate(total=Sum(field))
+            .values("total")
+        )
+        return Coalesce(
+            Subquery(rows), Value(0), output_field=model._meta.get_field(field)
+        )
+
+    Batch.objects.update(
+        expenses_total=summed(Expense, "amount"),
+        feed_total=summed(FeedingRecord, "amount"),
+        feed_bags_total=summed(FeedingRecord, "bags"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("farm", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="batch",
+            name="expenses_total",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="batch",
+            name="feed_bags_total",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="batch",
+            name="feed_total",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), editable=False, max_digits=12
+            ),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0003_syncreceipt"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="batch",
+            index=models.Index(
+                fields=["-arrival_date", "-id"], name="batch_arrival_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mortalityrecord",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="mortality_created_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_summary(apps, schema_editor):
+    Batch = apps.get_model("farm", "Batch")
+    MortalityRecord = apps.get_model("farm", "MortalityRecord")
+    MonthlyAnimalSummary = apps.get_model("farm", "MonthlyAnimalSummary")
+
+    rows = {}
+    cohorts = (
+        Batch.objects.order_by()
+        .annotate(month=TruncMonth("arrival_date"))
+        .values("animal_id", "month")
+        .annotate(
+            batch_count=Count("id"),
+            heads_in=Sum("initial_quantity"),
+            expenses_total=Sum("expenses_total"),
+            feed_total=Sum("feed_total"),
+            feed_bags_total=Sum("feed_bags_total"),
+        )
+    )
+    for row in cohorts:
+        key = (row.pop("animal_id"), row.pop("month"))
+        rows[key] = MonthlyAnimalSummary(animal_id=key[0], month=key[1], **row)
+
+    deaths = (
+        MortalityRecord.objects.filter(approved=True)
+        .order_by()
+        .annotate(month=TruncMonth("batch__arrival_date"))
+        .values("batch__animal_id", "month")
+        .annotate(total=Sum("count"))
+    )
+    for row in deaths:
+        rows[(row["batch__animal_id"], row["month"])].deaths = row["total"]
+
+    MonthlyAnimalSummary.objects.bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyAnimalSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("batch_count", models.IntegerField(default=0)),
+                ("heads_in", models.IntegerField(default=0)),
+                ("deaths", models.IntegerField(default=0)),
+                (
+                    "expenses_total",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                (
+                    "feed_total",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("feed_bags_total", models.IntegerField(default=0)),
+                (
+                    "animal",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_summaries",
+                        to="farm.animaltype",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("animal", "month"),
+                        name="monthly_summary_animal_month_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0005_monthly_animal_summary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="batch",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0006_batch_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="batch",
+            index=models.Index(
+                fields=["animal", "-arrival_date", "-id"],
+                name="batch_animal_arrival_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="batch",
+            index=models.Index(
+                condition=models.Q(("is_moved_to_shop", False)),
+                fields=["-arrival_date", "-id"],
+                name="batch_active_arrival_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="expense_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["batch", "-created_at", "-id"], name="expense_batch_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedingrecord",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="feeding_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedingrecord",
+            index=models.Index(
+                fields=["batch", "-created_at", "-id"], name="feeding_batch_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mortalityrecord",
+            index=models.Index(
+                fields=["batch", "-created_at", "-id"],
+                name="mortality_batch_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mortalityrecord",
+            index=models.Index(
+                condition=models.Q(("approved", False)),
+                fields=["-created_at", "-id"],
+                name="mortality_pending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_approved_at(apps, schema_editor):
+    # Approval time was not recorded before; the report time is the closest known
+    MortalityRecord = apps.get_model("farm", "MortalityRecord")
+    MortalityRecord.objects.filter(approved=True, approved_at__isnull=True).update(
+        approved_at=F("created_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0007_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mortalityrecord",
+            name="approved_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_approved_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="BatchDailySnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("quantity", models.IntegerField()),
+                ("deaths", models.IntegerField(default=0)),
+                (
+                    "expenses_total",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                (
+                    "feed_total",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("feed_bags_total", models.IntegerField(default=0)),
+                (
+                    "unit_cost",
+                    models.DecimalField(
+                        decimal_places=4, default=Decimal("0.0000"), max_digits=12
+                    ),
+                ),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "batch",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_snapshots",
+                        to="farm.batch",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("batch", "day"), name="batch_snapshot_batch_day_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:47
+
+import re
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    # Start each day's counter past the numeric suffixes already in use, so the
+    # old BATCH-<day>-<quantity> serials can never be handed out again
+    Batch = apps.get_model("farm", "Batch")
+    SerialCounter = apps.get_model("farm", "SerialCounter")
+    pattern = re.compile(r"^BATCH-(\d{8})-(\d+)$")
+    highest = {}
+    for serial in Batch.objects.values_list("serial_number", flat=True).iterator(chunk_size=2000):
+        match = pattern.match(serial or "")
+        if not match:
+            continue
+        try:
+            day = datetime.strptime(match.group(1), "%Y%m%d").date()
+        except ValueError:
+            # An impossible date can never be allocated
+            continue
+        highest[day] = max(highest.get(day, 0), int(match.group(2)))
+    SerialCounter.objects.bulk_create(
+        [SerialCounter(day=day, last_number=number) for day, number in highest.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0008_batch_daily_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SerialCounter",
+            fields=[
+                ("day", models.DateField(primary_key=True, serialize=False)),
+                ("last_number", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0009_batch_serial_counter"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="syncreceipt",
+            name="key",
+            field=models.UUIDField(),
+        ),
+        migrations.AddConstraint(
+            model_name="syncreceipt",
+            constraint=models.UniqueConstraint(
+                fields=("user", "key"), name="sync_receipt_user_key_uniq"
+            ),
+        ),
+    ]
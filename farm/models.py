@@ -1,9 +1,58 @@
-from django.db import models, transaction
+import re
+import threading
+from abc import ABCMeta, abstractmethod
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time
+
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncDate, TruncMonth
 from django.contrib.auth import get_user_model
-from decimal import Decimal
+from django.utils import timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+from . import cache
 
 User = get_user_model()
 
+# Running totals on Batch that only the cost ledger may write
+LEDGER_FIELDS = ('expenses_total', 'feed_total', 'feed_bags_total')
+# Columns a full Batch.save() leaves to F()-based updates
+COUNTER_FIELDS = LEDGER_FIELDS + ('version',)
+
+
+# Serials handed out by SerialCounter: BATCH-<arrival YYYYMMDD>-<n>
+SERIAL_PATTERN = re.compile(r'^BATCH-(\d{8})-(\d+)$')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+# Batches whose child rows are being deleted by a caller that settles the batch
+# and its cohort summary once (a batch delete, or a queryset delete of child
+# rows); the per-row delete receivers in signals.py leave these batches alone.
+# Only deferring_batch_updates() writes the set, and it always restores it, so
+# a delete that fails or rolls back leaves nothing deferred behind.
+_deferred = threading.local()
+
+
+def deferred_batches():
+    if not hasattr(_deferred, 'batches'):
+        _deferred.batches = set()
+    return _deferred.batches
+
+
+@contextmanager
+def deferring_batch_updates(batch_ids):
+    added = set(batch_ids) - deferred_batches()
+    deferred_batches().update(added)
+    try:
+        yield
+    finally:
+        deferred_batches().difference_update(added)
+
 
 class AnimalType(models.Model):
     code = models.CharField(max_length=50, unique=True)
@@ -13,6 +62,207 @@ class AnimalType(models.Model):
         return self.name
 
 
+def _summed(model, field):
+    """Correlated subquery summing ``field`` over a batch's child rows."""
+    rows = (model.objects.filter(batch=OuterRef('pk'))
+            .order_by().values('batch').annotate(total=Sum(field)).values('total'))
+    return Coalesce(Subquery(rows), Value(0), output_field=model._meta.get_field(field))
+
+
+class BatchQuerySet(models.QuerySet):
+    def add_costs(self, expenses=Decimal('0.00'), feed=Decimal('0.00'), bags=0):
+        """Apply running-total deltas in one UPDATE, so concurrent writers never lose a change."""
+        updated = self.update(
+            expenses_total=F('expenses_total') + expenses,
+            feed_total=F('feed_total') + feed,
+            feed_bags_total=F('feed_bags_total') + bags,
+            version=F('version') + 1,
+        )
+        if updated:
+            cohorts = Counter((a, month_start(d)) for a, d in self.values_list('animal_id', 'arrival_date'))
+            MonthlyAnimalSummary.objects.apply_deltas({
+                key: {'expenses_total': expenses * n, 'feed_total': feed * n, 'feed_bags_total': bags * n}
+                for key, n in cohorts.items()
+            })
+        return updated
+
+    def apply_costs(self, deltas):
+        """
+        Post different deltas per batch, given as ``{batch_id: {'expenses', 'feed', 'bags'}}``,
+        with one locking read and one UPDATE however many batches are involved.
+        """
+        rows = list(self.filter(pk__in=deltas).order_by('pk').select_for_update()
+                    .values_list('pk', 'animal_id', 'arrival_date'))
+        if not rows:
+            return 0
+
+        def delta(key, field):
+            cases = [When(pk=pk, then=Value(deltas[pk][key])) for pk, _, _ in rows]
+            return F(field) + Case(*cases, default=Value(0), output_field=self.model._meta.get_field(field))
+
+        self.filter(pk__in=[pk for pk, _, _ in rows]).update(
+            expenses_total=delta('expenses', 'expenses_total'),
+            feed_total=delta('feed', 'feed_total'),
+            feed_bags_total=delta('bags', 'feed_bags_total'),
+            version=F('version') + 1,
+        )
+        cohorts = defaultdict(lambda: {'expenses_total': Decimal('0.00'), 'feed_total': Decimal('0.00'),
+                                       'feed_bags_total': 0})
+        for pk, animal_id, arrival in rows:
+            totals = cohorts[(animal_id, month_start(arrival))]
+            totals['expenses_total'] += deltas[pk]['expenses']
+            totals['feed_total'] += deltas[pk]['feed']
+            totals['feed_bags_total'] += deltas[pk]['bags']
+        MonthlyAnimalSummary.objects.apply_deltas(cohorts)
+        return len(rows)
+
+    def record_deaths(self, deaths):
+        """
+        Take approved deaths, given as ``{batch_id: count}``, off the headcounts
+        with one F()-based UPDATE that floors at zero and bumps the versions.
+        """
+        if not deaths:
+            return 0
+        # Batch rows first, then the cohort summary, in the same order as every other ledger write
+        updated = self.filter(pk__in=deaths).update(
+            current_quantity=Greatest(
+                Coalesce('current_quantity', 0) - Case(
+                    *[When(pk=batch_id, then=Value(count)) for batch_id, count in deaths.items()],
+                    output_field=models.IntegerField(),
+                ),
+                0,
+            ),
+            version=F('version') + 1,
+        )
+        MonthlyAnimalSummary.objects.add_deaths(deaths)
+        if self.filter(pk__in=deaths, is_moved_to_shop=True).exists():
+            # Deaths in shop stock change the available quantity
+            catalog_changed()
+        return updated
+
+    def delete(self):
+        # The child rows' delete receivers stand aside; the Batch receivers settle each batch once
+        with transaction.atomic(), deferring_batch_updates(self.values_list('pk', flat=True)):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def touch(self):
+        """Bump the version of these batches after a write to them or their child rows."""
+        return self.update(version=F('version') + 1)
+
+    def with_costs(self):
+        """Annotate total and unit cost from the ledger columns so readers need no extra queries."""
+        cost = F('expenses_total') + F('feed_total')
+        return self.annotate(
+            cost_total=ExpressionWrapper(cost, output_field=models.DecimalField(max_digits=13, decimal_places=2)),
+            cost_per_unit=ExpressionWrapper(
+                cost / Greatest(Coalesce('current_quantity', 1), 1),
+                output_field=models.DecimalField(max_digits=20, decimal_places=8),
+            ),
+        )
+
+    @transaction.atomic
+    def move_to_shop(self, by_user=None):
+        """
+        Move every batch in this queryset that is not yet in the shop: lock the
+        rows in primary-key order, freeze their costs from the ledger columns,
+        write them back with one bulk UPDATE and create the missing ShopItems.
+        Returns the list of batches moved.
+        """
+        batches = list(
+            Batch.objects.select_for_update()
+            .filter(pk__in=self.filter(is_moved_to_shop=False).values('pk'), is_moved_to_shop=False)
+            .order_by('pk')
+        )
+        if not batches:
+            return []
+
+        fields = ['locked_total_cost', 'locked_unit_cost', 'is_moved_to_shop', 'version']
+        if by_user:
+            fields.append('created_by')
+        for b in batches:
+            b.locked_total_cost = b.total_cost
+            b.locked_unit_cost = b.unit_cost
+            b.is_moved_to_shop = True
+            b.version += 1  # row is locked, plain increment is safe
+            if by_user:
+                b.created_by = by_user
+
+        Batch.objects.bulk_update(batches, fields)
+        ShopItem.objects.bulk_create([ShopItem(batch=b) for b in batches], ignore_conflicts=True)
+        catalog_changed()
+        return batches
+
+    def with_actual_costs(self):
+        """Annotate the totals recomputed from the child tables (used for reconciliation)."""
+        return self.annotate(
+            actual_expenses=_summed(Expense, 'amount'),
+            actual_feed=_summed(FeedingRecord, 'amount'),
+            actual_bags=_summed(FeedingRecord, 'bags'),
+        )
+
+    def rebuild_costs(self):
+        """Overwrite the running totals with fresh sums of the child rows."""
+        return self.update(
+            expenses_total=_summed(Expense, 'amount'),
+            feed_total=_summed(FeedingRecord, 'amount'),
+            feed_bags_total=_summed(FeedingRecord, 'bags'),
+        )
+
+
+class SerialCounterQuerySet(models.QuerySet):
+    def allocate(self, day, count=1):
+        """
+        Reserve ``count`` consecutive serial numbers for batches arriving on
+        ``day`` and return them. A single upsert on that day's counter row:
+        atomic, never retried, and only creates for the same day wait on it.
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        table, day_column, last_column = (quote(self.model._meta.db_table), quote('day'), quote('last_number'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({day_column}, {last_column}) VALUES (%s, %s) "
+                f"ON CONFLICT ({day_column}) DO UPDATE SET {last_column} = {table}.{last_column} + %s "
+                f"RETURNING {last_column}",
+                [day, count, count],
+            )
+            last = cursor.fetchone()[0]
+        return [f"BATCH-{day:%Y%m%d}-{n}" for n in range(last - count + 1, last + 1)]
+
+    def observe(self, serials):
+        """
+        Move counters past serials in the allocator's format that were written
+        by hand or imported. Serials with an impossible date (BATCH-20251301-1)
+        can never be allocated, so they are left alone.
+        """
+        highest = {}
+        for serial in serials:
+            match = SERIAL_PATTERN.match(serial or '')
+            if not match:
+                continue
+            try:
+                day = datetime.strptime(match.group(1), '%Y%m%d').date()
+            except ValueError:
+                continue
+            highest[day] = max(highest.get(day, 0), int(match.group(2)))
+        if not highest:
+            return
+        self.bulk_create([SerialCounter(day=day) for day in highest], ignore_conflicts=True)
+        for day, number in sorted(highest.items()):
+            self.filter(day=day, last_number__lt=number).update(last_number=number)
+
+
+class SerialCounter(models.Model):
+    """Last batch serial number handed out per arrival day."""
+    day = models.DateField(primary_key=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    objects = SerialCounterQuerySet.as_manager()
+
+
 class Batch(models.Model):
     animal = models.ForeignKey(AnimalType, on_delete=models.PROTECT, related_name='batches')
     arrival_date = models.DateField()
@@ -24,24 +274,71 @@ class Batch(models.Model):
     locked_total_cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     locked_unit_cost = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
 
+    # Running cost ledger, kept current by Expense / FeedingRecord writes
+    expenses_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    feed_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    feed_bags_total = models.PositiveIntegerField(default=0, editable=False)
+
+    # Bumped on every write to the batch or its child rows; keys cached payloads and ETags
+    version = models.PositiveIntegerField(default=1, editable=False)
+
     created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BatchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for the batch list
+            models.Index(fields=['-arrival_date', '-id'], name='batch_arrival_id_idx'),
+            # ?animal= and ?is_moved_to_shop=false in the same order
+            models.Index(fields=['animal', '-arrival_date', '-id'], name='batch_animal_arrival_idx'),
+            models.Index(fields=['-arrival_date', '-id'], condition=Q(is_moved_to_shop=False),
+                         name='batch_active_arrival_idx'),
+        ]
+
+    @transaction.atomic
     def save(self, *args, **kwargs):
+        self.arrival_date = self._meta.get_field('arrival_date').to_python(self.arrival_date)
+
         if not self.serial_number:
-            day = self.arrival_date.strftime('%Y%m%d')
-            self.serial_number = f"BATCH-{day}-{self.initial_quantity}"
+            self.serial_number = SerialCounter.objects.allocate(self.arrival_date)[0]
+        elif self._state.adding:
+            SerialCounter.objects.observe([self.serial_number])
 
         if self.current_quantity is None:
             self.current_quantity = self.initial_quantity
 
+        # A full save must not write back ledger totals that may be stale in memory
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in COUNTER_FIELDS
+            ]
+
+        previous = None
+        if not self._state.adding:
+            previous = (Batch.objects.filter(pk=self.pk)
+                        .values('animal_id', 'arrival_date', 'initial_quantity', *LEDGER_FIELDS).first())
+            self.version = F('version') + 1
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'version']
+
         super().save(*args, **kwargs)
+        if previous is not None:
+            self.refresh_from_db(fields=['version'])
+        MonthlyAnimalSummary.objects.track_batch(self, previous)
+        if self.is_moved_to_shop:
+            catalog_changed()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(), deferring_batch_updates([self.pk]):
+            return super().delete(*args, **kwargs)
 
     def total_expenses(self):
-        return self.expenses.aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        return self.expenses_total
 
     def total_feed(self):
-        return self.feeding_records.aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        return self.feed_total
 
     @property
     def total_cost(self):
@@ -52,31 +349,117 @@ class Batch(models.Model):
         qty = self.current_quantity or 1
         return (self.total_cost / Decimal(qty)).quantize(Decimal("0.0001"))
 
-    @transaction.atomic
     def move_to_shop(self, by_user=None):
         if self.is_moved_to_shop:
             raise ValueError("Batch already moved to shop")
 
-        b = Batch.objects.select_for_update().get(pk=self.pk)
+        moved = Batch.objects.filter(pk=self.pk).move_to_shop(by_user=by_user)
+        if not moved:
+            raise ValueError("Batch already moved to shop")
 
-        b.locked_total_cost = self.total_cost
-        b.locked_unit_cost = self.unit_cost
-        b.is_moved_to_shop = True
+        b = moved[0]
+        self.locked_total_cost = b.locked_total_cost
+        self.locked_unit_cost = b.locked_unit_cost
+        self.is_moved_to_shop = True
+        self.created_by = b.created_by
 
-        if by_user:
-            b.created_by = by_user
-        b.save()
 
+class BatchChildQuerySet(models.QuerySet, metaclass=ABCMeta):
+    """
+    Queryset deletes settle each parent batch once from a grouped read,
+    instead of once per row in the delete receivers.
+    """
+
+    @abstractmethod
+    def deletion_deltas(self):
+        """``{batch_id: delta}`` for the rows about to be deleted, read before the delete."""
+
+    @abstractmethod
+    def settle_deletion(self, deltas):
+        """Apply the ``deletion_deltas()`` result once the rows are gone."""
+
+    def delete(self):
+        with transaction.atomic():
+            deltas = self.deletion_deltas()
+            with deferring_batch_updates(deltas):
+                deleted = super().delete()
+            if deltas:
+                self.settle_deletion(deltas)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class CostLedgerQuerySet(BatchChildQuerySet):
+    def deletion_deltas(self):
+        columns = self.model.LEDGER_COLUMNS
+        totals = self.order_by().values('batch').annotate(
+            **{f'deleted_{key}': Sum(field) for key, field in columns.items()})
+        return {row['batch']: {'expenses': Decimal('0.00'), 'feed': Decimal('0.00'), 'bags': 0,
+                               **{key: -row[f'deleted_{key}'] for key in columns}}
+                for row in totals}
+
+    def settle_deletion(self, deltas):
+        Batch.objects.apply_costs(deltas)
+
+
+class CostLedgerMixin(models.Model):
+    """Keeps the parent batch's running cost totals in step with this record."""
+
+    # Ledger delta ('expenses', 'feed' or 'bags') -> the column of this record that carries it;
+    # every subclass declares its own, checked when the class is defined
+    LEDGER_COLUMNS = {}
+
+    objects = CostLedgerQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not cls.__dict__.get('LEDGER_COLUMNS'):
+            raise TypeError(f"{cls.__name__} must declare LEDGER_COLUMNS")
+
+    def ledger_values(self):
+        return {key: self._meta.get_field(column).to_python(getattr(self, column))
+                for key, column in self.LEDGER_COLUMNS.items()}
+
+    def post_to_ledger(self, sign=1):
+        deltas = {key: sign * value for key, value in self.ledger_values().items()}
+        Batch.objects.filter(pk=self.batch_id).add_costs(**deltas)
 
-class Expense(models.Model):
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        previous = None
+        if self.pk:
+            previous = type(self).objects.select_for_update().filter(pk=self.pk).first()
+
+        super().save(*args, **kwargs)
+
+        if previous is not None:
+            previous.post_to_ledger(sign=-1)
+        self.post_to_ledger()
+
+
+class Expense(CostLedgerMixin):
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='expenses')
     description = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     recorded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    LEDGER_COLUMNS = {'expenses': 'amount'}
 
-class FeedingRecord(models.Model):
+    class Meta:
+        indexes = [
+            # Keyset order for the list, and the same order within one batch (?batch=)
+            models.Index(fields=['-created_at', '-id'], name='expense_created_id_idx'),
+            models.Index(fields=['batch', '-created_at', '-id'], name='expense_batch_created_idx'),
+        ]
+
+
+class FeedingRecord(CostLedgerMixin):
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='feeding_records')
     bags = models.PositiveIntegerField(default=1)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
@@ -84,6 +467,65 @@ class FeedingRecord(models.Model):
     recorded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    LEDGER_COLUMNS = {'feed': 'amount', 'bags': 'bags'}
+
+    class Meta:
+        indexes = [
+            # Keyset order for the list, and the same order within one batch (?batch=)
+            models.Index(fields=['-created_at', '-id'], name='feeding_created_id_idx'),
+            models.Index(fields=['batch', '-created_at', '-id'], name='feeding_batch_created_idx'),
+        ]
+
+
+class MortalityRecordQuerySet(BatchChildQuerySet):
+    def deletion_deltas(self):
+        rows = self.order_by().values('batch').annotate(
+            deaths=Coalesce(Sum('count', filter=Q(approved=True)), 0)).values_list('batch', 'deaths')
+        return dict(rows)
+
+    def settle_deletion(self, deltas):
+        Batch.objects.filter(pk__in=deltas).touch()
+        MonthlyAnimalSummary.objects.add_deaths({batch_id: -n for batch_id, n in deltas.items() if n})
+
+    def pending_rows(self):
+        return list(self.filter(approved=False).order_by('pk').values_list('pk', 'batch_id', 'count'))
+
+    @transaction.atomic
+    def approve(self, approver, at=None):
+        """
+        Approve every pending record in this queryset without locking reads.
+        Records are flipped by a conditional ``UPDATE ... WHERE approved =
+        false``, so of two racing approvers exactly one flips each record and
+        the affected-row count tells it so; only the records won this way come
+        off their batch's headcount. Returns the number of records approved.
+        """
+        pks = [pk for pk, _, _ in self.pending_rows()]
+        if not pks:
+            return 0
+
+        flag = {'approved': True, 'approved_by': approver, 'approved_at': at or timezone.now()}
+        savepoint = transaction.savepoint()
+        if MortalityRecord.objects.filter(pk__in=pks, approved=False).update(**flag) == len(pks):
+            transaction.savepoint_commit(savepoint)
+        else:
+            # Another approver got to some of them first: claim one by one to learn which are ours
+            transaction.savepoint_rollback(savepoint)
+            pks = [pk for pk in pks if MortalityRecord.objects.filter(pk=pk, approved=False).update(**flag)]
+
+        Batch.objects.record_deaths(MortalityRecord.objects.filter(pk__in=pks).deaths())
+        return len(pks)
+
+    def deaths(self):
+        """
+        ``{batch_id: count}`` summed over these rows as stored. Read after the
+        approving UPDATE, when those rows are locked by it, so the deaths
+        applied are the ones actually approved, not an earlier read.
+        """
+        deaths = defaultdict(int)
+        for batch_id, count in self.values_list('batch_id', 'count'):
+            deaths[batch_id] += count
+        return deaths
+
 
 class MortalityRecord(models.Model):
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='mortalities')
@@ -94,36 +536,390 @@ class MortalityRecord(models.Model):
         User, null=True, blank=True, on_delete=models.SET_NULL,
         related_name='approved_mortalities'
     )
+    # When the deaths came off the headcount; daily snapshots count them on this day
+    approved_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MortalityRecordQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for the mortality list
+            models.Index(fields=['-created_at', '-id'], name='mortality_created_id_idx'),
+            # ?batch= lists, and the pending queue approvers work through
+            models.Index(fields=['batch', '-created_at', '-id'], name='mortality_batch_created_idx'),
+            models.Index(fields=['-created_at', '-id'], condition=Q(approved=False), name='mortality_pending_idx'),
+        ]
+
     @transaction.atomic
-    def approve(self, approver):
-        print(">>> APPROVE METHOD CALLED for record ID:", self.id, "count=", self.count)
+    def save(self, *args, **kwargs):
+        previous = None
+        if self.pk:
+            previous = (MortalityRecord.objects.select_for_update().filter(pk=self.pk)
+                        .values_list('batch_id', 'count', 'approved').first())
+
+        super().save(*args, **kwargs)
+        Batch.objects.filter(pk=self.batch_id).touch()
 
-        mr = MortalityRecord.objects.select_for_update().get(pk=self.pk)
-        print(">>> Loaded MR from DB. Approved =", mr.approved)
+        # An approved record edited in place (count or batch, e.g. in the admin) moves its deaths with it
+        deaths = Counter()
+        if previous is not None and previous[2]:
+            deaths[previous[0]] -= previous[1]
+        if previous is not None and self.approved:
+            deaths[self.batch_id] += self.count
+        Batch.objects.record_deaths({batch_id: n for batch_id, n in deaths.items() if n})
 
-        if mr.approved:
-            print(">>> Already approved. EXITING")
-            return
+    @transaction.atomic
+    def approve(self, approver):
+        """Approve this record unless another approver already has; returns whether this call did."""
+        at = timezone.now()
+        if not MortalityRecord.objects.filter(pk=self.pk, approved=False).update(
+                approved=True, approved_by=approver, approved_at=at):
+            return False
+        # The count in memory may be stale; take the deaths from the row this call approved
+        self.batch_id, self.count = MortalityRecord.objects.filter(pk=self.pk).values_list('batch_id', 'count').get()
+        Batch.objects.record_deaths({self.batch_id: self.count})
+        self.approved = True
+        self.approved_by = approver
+        self.approved_at = at
+        return True
 
-        batch = Batch.objects.select_for_update().get(pk=mr.batch_id)
 
-        print(">>> Batch before:", batch.current_quantity)
+def catalog_changed():
+    """Drop the cached shop catalog and rebuild it once the current transaction commits."""
+    cache.forget_catalog()
+    transaction.on_commit(lambda: cache.store_catalog(ShopItem.objects.catalog()))
 
-        new_qty = (batch.current_quantity or 0) - mr.count
-        batch.current_quantity = max(0, new_qty)
 
-        print(">>> Batch after:", batch.current_quantity)
+class ShopItemQuerySet(BatchChildQuerySet):
+    def deletion_deltas(self):
+        return dict.fromkeys(self.values_list('batch_id', flat=True))
 
-        mr.approved = True
-        mr.approved_by = approver
+    def settle_deletion(self, deltas):
+        Batch.objects.filter(pk__in=deltas).touch()
 
-        batch.save(update_fields=['current_quantity'])
-        mr.save(update_fields=['approved', 'approved_by'])
+    @transaction.atomic
+    def reprice(self, prices=None, markup=None):
+        """
+        Set selling prices in Decimal with one UPDATE. ``prices`` maps item id
+        to price; otherwise every item here is priced at its batch's locked
+        unit cost plus ``markup`` percent. A price at or below that cost is
+        rejected. Returns ``(updated, rejected)``: ``{id: price}`` written and
+        ``[{'id', 'price', 'locked_unit_cost', 'detail'}]`` not written.
+        """
+        rows = self.filter(pk__in=prices) if prices is not None else self
+        rows = {pk: (batch_id, cost) for pk, batch_id, cost in
+                rows.order_by('pk').values_list('pk', 'batch_id', 'batch__locked_unit_cost')}
+        updated, rejected, batch_ids = {}, [], []
+
+        def reject(pk, price, cost, detail):
+            rejected.append({'id': pk, 'price': None if price is None else str(price),
+                             'locked_unit_cost': None if cost is None else str(cost), 'detail': detail})
+
+        for pk in (prices if prices is not None else rows):
+            if pk not in rows:
+                reject(pk, prices[pk], None, 'shop item not found')
+                continue
+            batch_id, cost = rows[pk]
+            if prices is not None:
+                price = prices[pk]
+            elif cost is None:
+                reject(pk, None, None, 'no locked unit cost to mark up')
+                continue
+            else:
+                price = (cost * (100 + markup) / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if cost is not None and price <= cost:
+                reject(pk, price, cost, 'selling price must be greater than locked unit cost')
+                continue
+            updated[pk] = price
+            batch_ids.append(batch_id)
+
+        if updated:
+            self.model.objects.filter(pk__in=updated).update(selling_price_per_unit=Case(
+                *[When(pk=pk, then=Value(price)) for pk, price in updated.items()],
+                output_field=self.model._meta.get_field('selling_price_per_unit'),
+            ))
+            Batch.objects.filter(pk__in=batch_ids).touch()
+            catalog_changed()
+        return updated, rejected
+
+    def in_stock(self):
+        return self.filter(selling_price_per_unit__isnull=False, batch__current_quantity__gt=0)
+
+    def catalog(self):
+        """The public listing of priced items with stock left, as plain data ready to cache."""
+        rows = (self.in_stock().order_by('batch__animal__name', 'selling_price_per_unit', 'id')
+                .values_list('id', 'batch__serial_number', 'batch__animal__code', 'batch__animal__name',
+                             'batch__current_quantity', 'selling_price_per_unit'))
+        return {
+            'generated_at': timezone.now().isoformat(),
+            'items': [
+                {'id': pk, 'serial_number': serial, 'animal': code, 'animal_name': name,
+                 'available': available, 'price': str(price)}
+                for pk, serial, code, name, available, price in rows
+            ],
+        }
 
 
 class ShopItem(models.Model):
     batch = models.OneToOneField(Batch, on_delete=models.CASCADE, related_name='shop_item')
     selling_price_per_unit = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ShopItemQuerySet.as_manager()
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Batch.objects.filter(pk=self.batch_id).touch()
+        catalog_changed()
+
+
+class SyncReceipt(models.Model):
+    """
+    Idempotency record for a client-generated key; a replayed key maps back to
+    the row it created. Keys are scoped to the user who sent them.
+    """
+    key = models.UUIDField()
+    record_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='sync_receipt_user_key_uniq'),
+        ]
+
+
+class MonthlySummaryQuerySet(models.QuerySet):
+    def apply_deltas(self, deltas):
+        """Add ``{(animal_id, month): {field: delta}}`` to the summary rows, creating rows as needed."""
+        for (animal_id, month), changes in sorted(deltas.items()):
+            changes = {field: value for field, value in changes.items() if value}
+            if not changes:
+                continue
+            updates = {field: F(field) + value for field, value in changes.items()}
+            if self.filter(animal_id=animal_id, month=month).update(**updates):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(animal_id=animal_id, month=month, **changes)
+            except IntegrityError:
+                # Another writer created the row first
+                self.filter(animal_id=animal_id, month=month).update(**updates)
+
+    def add_deaths(self, deaths):
+        """Record approved deaths given as ``{batch_id: count}``."""
+        totals = defaultdict(int)
+        for batch_id, animal_id, arrival in Batch.objects.filter(pk__in=deaths).values_list(
+                'pk', 'animal_id', 'arrival_date'):
+            totals[(animal_id, month_start(arrival))] += deaths[batch_id]
+        self.apply_deltas({key: {'deaths': count} for key, count in totals.items()})
+
+    def track_batch(self, batch, previous):
+        """Move a saved batch's contribution when it is created or its cohort/headcount changes."""
+        new_key = (batch.animal_id, month_start(batch.arrival_date))
+        if previous is None:
+            self.apply_deltas({new_key: {'batch_count': 1, 'heads_in': batch.initial_quantity}})
+            return
+
+        old_key = (previous['animal_id'], month_start(previous['arrival_date']))
+        if old_key == new_key:
+            self.apply_deltas({new_key: {'heads_in': batch.initial_quantity - previous['initial_quantity']}})
+            return
+
+        deaths = (batch.mortalities.filter(approved=True).aggregate(total=Sum('count'))['total'] or 0)
+        moved = {field: previous[field] for field in LEDGER_FIELDS}
+        moved.update(batch_count=1, deaths=deaths)
+        self.apply_deltas({
+            old_key: {**{f: -v for f, v in moved.items()}, 'heads_in': -previous['initial_quantity']},
+            new_key: {**moved, 'heads_in': batch.initial_quantity},
+        })
+
+    @transaction.atomic
+    def rebuild(self):
+        """Recompute every row from the batch ledger columns and approved mortalities."""
+        rows = {}
+        cohorts = (Batch.objects.order_by().annotate(month=TruncMonth('arrival_date'))
+                   .values('animal_id', 'month')
+                   .annotate(batch_count=Count('id'), heads_in=Sum('initial_quantity'),
+                             expenses_total=Sum('expenses_total'), feed_total=Sum('feed_total'),
+                             feed_bags_total=Sum('feed_bags_total')))
+        for row in cohorts:
+            key = (row.pop('animal_id'), row.pop('month'))
+            rows[key] = MonthlyAnimalSummary(animal_id=key[0], month=key[1], **row)
+
+        deaths = (MortalityRecord.objects.filter(approved=True).order_by()
+                  .annotate(month=TruncMonth('batch__arrival_date'))
+                  .values('batch__animal_id', 'month').annotate(total=Sum('count')))
+        for row in deaths:
+            rows[(row['batch__animal_id'], row['month'])].deaths = row['total']
+
+        self.all().delete()
+        self.bulk_create(rows.values())
+        return len(rows)
+
+
+class MonthlyAnimalSummary(models.Model):
+    """
+    Pre-aggregated figures per animal type and arrival-month cohort: every
+    batch contributes its headcount, costs and approved deaths to the month
+    it arrived in. Maintained incrementally by the write paths; the
+    rebuild_farm_summary command recomputes it from scratch.
+    """
+    animal = models.ForeignKey(AnimalType, on_delete=models.CASCADE, related_name='monthly_summaries')
+    month = models.DateField()
+    batch_count = models.IntegerField(default=0)
+    heads_in = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    expenses_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    feed_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    feed_bags_total = models.IntegerField(default=0)
+
+    objects = MonthlySummaryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['animal', 'month'], name='monthly_summary_animal_month_uniq'),
+        ]
+
+    @property
+    def cost_total(self):
+        return self.expenses_total + self.feed_total
+
+    @property
+    def cost_per_head(self):
+        if not self.heads_in:
+            return None
+        return (self.cost_total / Decimal(self.heads_in)).quantize(Decimal("0.01"))
+
+    @property
+    def mortality_rate(self):
+        if not self.heads_in:
+            return None
+        return (Decimal(self.deaths) / Decimal(self.heads_in)).quantize(Decimal("0.0001"))
+
+
+class BatchSnapshotQuerySet(models.QuerySet):
+    def stale_batches(self, since=None):
+        """
+        ``{batch_id: first_day}`` for every batch with activity recorded at or
+        after ``since`` (everything when None): new batches from their arrival,
+        expenses and feedings by creation day, mortalities by approval day.
+        """
+        starts = {}
+
+        def earliest(rows):
+            for batch_id, day in rows:
+                if day is not None and (batch_id not in starts or day < starts[batch_id]):
+                    starts[batch_id] = day
+
+        batches = Batch.objects.all() if since is None else Batch.objects.filter(created_at__gte=since)
+        earliest(batches.values_list('pk', 'arrival_date'))
+        for model, stamp in ((Expense, 'created_at'), (FeedingRecord, 'created_at'), (MortalityRecord, 'approved_at')):
+            rows = model.objects.filter(**{f'{stamp}__isnull': False})
+            if since is not None:
+                rows = rows.filter(**{f'{stamp}__gte': since})
+            earliest(rows.order_by().values('batch_id').annotate(first=Min(TruncDate(stamp)))
+                     .values_list('batch_id', 'first'))
+        return starts
+
+    @transaction.atomic
+    def refresh(self, starts, computed_at=None):
+        """
+        Rewrite the snapshots of each batch from its ``starts`` day onwards.
+        Earlier rows are kept and carry the running totals in, so only the
+        days with new activity are aggregated. Returns the rows written.
+        """
+        if not starts:
+            return 0
+        computed_at = computed_at or timezone.now()
+        batch_ids = list(starts)
+        stale = Q()
+        for batch_id, day in starts.items():
+            stale |= Q(batch_id=batch_id, day__gte=day)
+        self.filter(stale).delete()
+
+        latest = self.filter(batch_id=OuterRef('batch_id')).order_by('-day').values('pk')[:1]
+        carried = {row.batch_id: row for row in self.filter(batch_id__in=batch_ids, pk=Subquery(latest))}
+        batches = {pk: (quantity, arrival) for pk, quantity, arrival in
+                   Batch.objects.filter(pk__in=batch_ids).values_list('pk', 'initial_quantity', 'arrival_date')}
+
+        # Day-level activity since the earliest start, one grouped query per table
+        first_day = min(starts.values())
+        since = timezone.make_aware(datetime.combine(first_day, time.min))
+        def no_activity():
+            return {'expenses': Decimal('0.00'), 'feed': Decimal('0.00'), 'bags': 0, 'deaths': 0}
+
+        activity = defaultdict(lambda: defaultdict(no_activity))
+        for model, stamp, sums in (
+            (Expense, 'created_at', {'expenses': Sum('amount')}),
+            (FeedingRecord, 'created_at', {'feed': Sum('amount'), 'bags': Sum('bags')}),
+            (MortalityRecord, 'approved_at', {'deaths': Sum('count')}),
+        ):
+            rows = (model.objects.filter(batch_id__in=batch_ids, **{f'{stamp}__gte': since})
+                    .order_by().annotate(day=TruncDate(stamp)).values('batch_id', 'day').annotate(**sums))
+            for row in rows:
+                if row['day'] >= starts[row['batch_id']]:
+                    day = activity[row['batch_id']][row['day']]
+                    for key in sums:
+                        day[key] += row[key] or 0
+
+        snapshots = []
+        for batch_id, start in starts.items():
+            if batch_id not in batches:
+                continue
+            initial, arrival = batches[batch_id]
+            days = activity[batch_id]
+            if arrival >= start:
+                # The arrival day opens the series even without other activity
+                days.setdefault(arrival, no_activity())
+            base = carried.get(batch_id)
+            deaths = base.deaths if base else 0
+            expenses = base.expenses_total if base else Decimal('0.00')
+            feed = base.feed_total if base else Decimal('0.00')
+            bags = base.feed_bags_total if base else 0
+            for day in sorted(days):
+                deaths += days[day]['deaths']
+                expenses += days[day]['expenses']
+                feed += days[day]['feed']
+                bags += days[day]['bags']
+                quantity = max(initial - deaths, 0)
+                snapshots.append(BatchDailySnapshot(
+                    batch_id=batch_id, day=day, quantity=quantity, deaths=deaths,
+                    expenses_total=expenses, feed_total=feed, feed_bags_total=bags,
+                    unit_cost=((expenses + feed) / max(quantity, 1)).quantize(Decimal('0.0001')),
+                    computed_at=computed_at,
+                ))
+        self.bulk_create(snapshots, batch_size=1000)
+        return len(snapshots)
+
+
+class BatchDailySnapshot(models.Model):
+    """
+    End-of-day state of a batch on each day it had activity: headcount after
+    approved deaths and cumulative costs. Days without a row are unchanged
+    from the previous row. Filled by the snapshot_batches command.
+    """
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='daily_snapshots')
+    day = models.DateField()
+    quantity = models.IntegerField()
+    deaths = models.IntegerField(default=0)
+    expenses_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    feed_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    feed_bags_total = models.IntegerField(default=0)
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, default=Decimal('0.0000'))
+    # Start of the run that wrote the row; the next run picks up activity from here
+    computed_at = models.DateTimeField()
+
+    objects = BatchSnapshotQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['batch', 'day'], name='batch_snapshot_batch_day_uniq'),
+        ]
+
+    @property
+    def cost_total(self):
+        return self.expenses_total + self.feed_total
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination on a composite, strictly descending ordering
+    whose last field is unique. The cursor carries the boundary row's values,
+    so every page is an index range scan with no OFFSET and no COUNT(*).
+    """
+    ordering = None
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """The sliced queryset for the requested page; evaluate it and pass the rows to finish_page()."""
+        self.request = request
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.page_size = self.get_page_size(request)
+        self.reverse, self.boundary = self.decode_cursor(request, queryset.model)
+
+        if self.boundary is not None:
+            queryset = queryset.filter(self.seek_filter(self.boundary, self.reverse))
+        ordering = self.fields if self.reverse else ['-' + name for name in self.fields]
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.has_next = has_more if not self.reverse else self.boundary is not None
+        self.has_previous = self.boundary is not None if not self.reverse else has_more
+        return rows
+
+    def seek_filter(self, boundary, reverse):
+        """``(a, b, ...) < boundary`` (or ``>`` when paging backwards) expanded for the ORM."""
+        op = 'gt' if reverse else 'lt'
+        condition = Q()
+        for depth in range(len(self.fields) - 1, -1, -1):
+            name, value = self.fields[depth], boundary[depth]
+            strict = Q(**{f'{name}__{op}': value})
+            condition = strict if depth == len(self.fields) - 1 else strict | (Q(**{name: value}) & condition)
+        # Leading-column range lets the planner bound the index scan
+        lead, value = self.fields[0], boundary[0]
+        return Q(**{f'{lead}__{op}e': value}) & condition
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            raw_values = payload['v']
+            if len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [model._meta.get_field(name).to_python(raw) for name, raw in zip(self.fields, raw_values)]
+            return bool(payload.get('r')), values
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse, url=None):
+        values = []
+        for name in self.fields:
+            value = getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(url or self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def continuation_link(self, request, url, rows, limit):
+        """
+        For a first page of ``rows`` fetched elsewhere (``limit + 1`` rows, in
+        this paginator's order), the link to the rest of them in the list at
+        ``url``, or None when there is nothing more.
+        """
+        if len(rows) <= limit:
+            return None
+        self.request = request
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        return self.encode_cursor(rows[limit - 1], reverse=False, url=request.build_absolute_uri(url))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class BatchPagination(KeysetPagination):
+    ordering = ('-arrival_date', '-id')
+
+
+class MortalityPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ShopPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ExpensePagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class FeedingPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
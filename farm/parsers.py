@@ -0,0 +1,26 @@
+import gzip
+import io
+import zlib
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+# Upper bound on an inflated request body, guards against decompression bombs
+MAX_INFLATED_SIZE = 10 * 1024 * 1024
+
+
+class GzipJSONParser(JSONParser):
+    """JSON parser that also accepts bodies sent with ``Content-Encoding: gzip``."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '') if request is not None else ''
+        if stream is not None and encoding.lower() == 'gzip':
+            try:
+                body = gzip.GzipFile(fileobj=stream).read(MAX_INFLATED_SIZE + 1)
+            except (OSError, EOFError, zlib.error) as exc:
+                raise ParseError(f'Invalid gzip body - {exc}')
+            if len(body) > MAX_INFLATED_SIZE:
+                raise ParseError('Decompressed body too large')
+            stream = io.BytesIO(body)
+        return super().parse(stream, media_type, parser_context)
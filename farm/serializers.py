@@ -1,12 +1,55 @@
+from decimal import Decimal
 from rest_framework import serializers
-from .models import AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, ShopItem
+from .models import (AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, ShopItem, MonthlyAnimalSummary,
+                     BatchDailySnapshot)
 from django.contrib.auth.models import User
+from .middleware import serializer_timing
+
+
+# ===========================
+# SHARED FIELDS
+# ===========================
+class TimedSerializerMixin:
+    """Reports time spent building representations to the request's Server-Timing."""
+
+    def to_representation(self, instance):
+        with serializer_timing():
+            return super().to_representation(instance)
+
+
+class SparseFieldsMixin:
+    """
+    Takes a ``fields`` keyword with the field names to keep; every other field
+    is dropped before serializing, so computed fields nobody asked for are
+    never evaluated. Without it the full representation is returned.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {'id'}:
+                self.fields.pop(name)
+
+
+class BatchLookupField(serializers.PrimaryKeyRelatedField):
+    """Batch FK that resolves from a preloaded ``context['batches']`` map when one is given."""
+
+    def to_internal_value(self, data):
+        batches = self.context.get('batches')
+        if batches is None:
+            return super().to_internal_value(data)
+        try:
+            return batches[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 
 # ===========================
 # ANIMAL TYPE
 # ===========================
-class AnimalTypeSerializer(serializers.ModelSerializer):
+class AnimalTypeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = AnimalType
         fields = ['id', 'code', 'name']
@@ -15,7 +58,8 @@ class AnimalTypeSerializer(serializers.ModelSerializer):
 # ===========================
 # EXPENSE
 # ===========================
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    batch = BatchLookupField(queryset=Batch.objects.all())
     recorded_by = serializers.ReadOnlyField(source='recorded_by.username')
 
     class Meta:
@@ -26,7 +70,8 @@ class ExpenseSerializer(serializers.ModelSerializer):
 # ===========================
 # FEEDING
 # ===========================
-class FeedingRecordSerializer(serializers.ModelSerializer):
+class FeedingRecordSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    batch = BatchLookupField(queryset=Batch.objects.all())
     recorded_by = serializers.ReadOnlyField(source='recorded_by.username')
 
     class Meta:
@@ -37,7 +82,8 @@ class FeedingRecordSerializer(serializers.ModelSerializer):
 # ===========================
 # MORTALITY
 # ===========================
-class MortalityRecordSerializer(serializers.ModelSerializer):
+class MortalityRecordSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    batch = BatchLookupField(queryset=Batch.objects.all())
     approved_by = serializers.ReadOnlyField(source='approved_by.username')
     approved = serializers.ReadOnlyField()
 
@@ -45,23 +91,49 @@ class MortalityRecordSerializer(serializers.ModelSerializer):
         model = MortalityRecord
         fields = [
             'id', 'batch', 'count', 'reason',
-            'approved', 'approved_by', 'created_at'
+            'approved', 'approved_by', 'approved_at', 'created_at'
         ]
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+
+
 # ===========================
 # SHOP ITEM
 # ===========================
-class ShopItemSerializer(serializers.ModelSerializer):
+class ShopItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ShopItem
         fields = ['id', 'batch', 'selling_price_per_unit', 'created_at']
 
 
+class PriceSerializer(serializers.Serializer):
+    selling_price_per_unit = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class ItemPriceSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class BulkRepriceSerializer(serializers.Serializer):
+    """Either explicit ``prices`` or a ``markup_percent`` over cost, optionally for one ``animal`` type."""
+    prices = ItemPriceSerializer(many=True, required=False, allow_empty=False, max_length=1000)
+    markup_percent = serializers.DecimalField(max_digits=7, decimal_places=2, min_value=Decimal('0.01'),
+                                              required=False)
+    animal = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if ('prices' in attrs) == ('markup_percent' in attrs):
+            raise serializers.ValidationError('give either prices or markup_percent')
+        return attrs
+
+
 # ===========================
 # BATCH (MAIN SERIALIZER)
 # ===========================
-class BatchSerializer(serializers.ModelSerializer):
+class BatchSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     # Relationships
     animal = AnimalTypeSerializer(read_only=True)
     animal_id = serializers.PrimaryKeyRelatedField(
@@ -74,6 +146,7 @@ class BatchSerializer(serializers.ModelSerializer):
     # Computed fields
     total_expenses = serializers.SerializerMethodField()
     total_feed = serializers.SerializerMethodField()
+    total_feed_bags = serializers.IntegerField(source='feed_bags_total', read_only=True)
     total_cost = serializers.SerializerMethodField()
     unit_cost = serializers.SerializerMethodField()
 
@@ -84,7 +157,7 @@ class BatchSerializer(serializers.ModelSerializer):
             'arrival_date', 'serial_number',
             'initial_quantity', 'current_quantity',
             'is_moved_to_shop',
-            'total_expenses', 'total_feed', 'total_cost', 'unit_cost',
+            'total_expenses', 'total_feed', 'total_feed_bags', 'total_cost', 'unit_cost',
             'created_at'
         ]
 
@@ -94,20 +167,76 @@ class BatchSerializer(serializers.ModelSerializer):
             'created_at'
         ]
 
+    # Nested objects a sparse request only gets through ?expand=
+    expandable = ('animal',)
+    # Readable field -> columns it reads (``.only()`` paths), for sparse requests
+    field_columns = {
+        'id': ('id',),
+        'animal': ('animal__id', 'animal__code', 'animal__name'),
+        'animal_name': ('animal__name',),
+        'arrival_date': ('arrival_date',),
+        'serial_number': ('serial_number',),
+        'initial_quantity': ('initial_quantity',),
+        'current_quantity': ('current_quantity',),
+        'is_moved_to_shop': ('is_moved_to_shop',),
+        'total_expenses': ('expenses_total',),
+        'total_feed': ('feed_total',),
+        'total_feed_bags': ('feed_bags_total',),
+        'total_cost': ('expenses_total', 'feed_total'),
+        'unit_cost': ('expenses_total', 'feed_total', 'current_quantity'),
+        'created_at': ('created_at',),
+    }
+
     # ---------- COMPUTED VALUES ----------
+    # Read from the batch's running cost ledger; no per-row aggregates
     def get_total_expenses(self, obj):
-        return obj.total_expenses()
+        return obj.expenses_total
 
     def get_total_feed(self, obj):
-        return obj.total_feed()
+        return obj.feed_total
 
+    # Querysets built with Batch.objects.with_costs() carry these as annotations
     def get_total_cost(self, obj):
+        if hasattr(obj, 'cost_total'):
+            return obj.cost_total
         return obj.total_cost
 
     def get_unit_cost(self, obj):
+        if hasattr(obj, 'cost_per_unit'):
+            return Decimal(obj.cost_per_unit).quantize(Decimal("0.0001"))
         return obj.unit_cost
     
     
+# ===========================
+# ANALYTICS
+# ===========================
+class MonthlySummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    animal_name = serializers.CharField(source='animal.name', read_only=True)
+    cost_total = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    cost_per_head = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    mortality_rate = serializers.DecimalField(max_digits=8, decimal_places=4, read_only=True)
+
+    class Meta:
+        model = MonthlyAnimalSummary
+        fields = [
+            'animal', 'animal_name', 'month',
+            'batch_count', 'heads_in', 'deaths',
+            'expenses_total', 'feed_total', 'feed_bags_total',
+            'cost_total', 'cost_per_head', 'mortality_rate',
+        ]
+
+
+class BatchSnapshotSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    cost_total = serializers.DecimalField(max_digits=13, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = BatchDailySnapshot
+        fields = [
+            'day', 'quantity', 'deaths',
+            'expenses_total', 'feed_total', 'feed_bags_total', 'cost_total', 'unit_cost',
+        ]
+
+
 # ===========================
 # USER REGISTRATION
 # ===========================
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import forget_user
+
+from .models import (LEDGER_FIELDS, AnimalType, Batch, Expense, FeedingRecord, MonthlyAnimalSummary, MortalityRecord,
+                     ShopItem, catalog_changed, deferred_batches, month_start)
+
+
+# Deletes of single rows arrive here from instance.delete() and admin inlines. Rows of a
+# batch being deleted, or of a queryset delete, are settled once per batch instead.
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=FeedingRecord)
+def reverse_ledger_entry(sender, instance, **kwargs):
+    if instance.batch_id not in deferred_batches():
+        instance.post_to_ledger(sign=-1)
+
+
+@receiver(post_delete, sender=MortalityRecord)
+def forget_approved_deaths(sender, instance, **kwargs):
+    if instance.approved and instance.batch_id not in deferred_batches():
+        MonthlyAnimalSummary.objects.add_deaths({instance.batch_id: -instance.count})
+
+
+@receiver(post_delete, sender=MortalityRecord)
+@receiver(post_delete, sender=ShopItem)
+def touch_parent_batch(sender, instance, **kwargs):
+    if instance.batch_id not in deferred_batches():
+        Batch.objects.filter(pk=instance.batch_id).touch()
+
+
+@receiver(post_delete, sender=ShopItem)
+def drop_from_catalog(sender, instance, **kwargs):
+    catalog_changed()
+
+
+# Batch payloads, ETags and the shop catalog embed the animal's code and name
+@receiver(post_save, sender=AnimalType)
+@receiver(post_delete, sender=AnimalType)
+def touch_animal_batches(sender, instance, **kwargs):
+    if Batch.objects.filter(animal=instance).touch():
+        catalog_changed()
+
+
+# A batch deleted through Batch.delete() or BatchQuerySet.delete() is deferred: its child
+# rows go first, skipped by the receivers above, and it takes its whole contribution off
+# its cohort at once. Otherwise the children reverse themselves and only the headcount is left.
+@receiver(pre_delete, sender=Batch)
+def read_cohort_totals(sender, instance, **kwargs):
+    if instance.pk not in deferred_batches():
+        return
+    instance.cohort_totals = (
+        Batch.objects.filter(pk=instance.pk)
+        .annotate(deaths=Coalesce(Sum('mortalities__count', filter=Q(mortalities__approved=True)), 0))
+        .values('animal_id', 'arrival_date', 'initial_quantity', 'deaths', *LEDGER_FIELDS).first()
+    )
+
+
+@receiver(post_delete, sender=Batch)
+def forget_batch_cohort(sender, instance, **kwargs):
+    totals = getattr(instance, 'cohort_totals', None)
+    if totals is None:
+        totals = {'animal_id': instance.animal_id, 'arrival_date': instance.arrival_date,
+                  'initial_quantity': instance.initial_quantity}
+    key = (totals.pop('animal_id'), month_start(totals.pop('arrival_date')))
+    totals['heads_in'] = totals.pop('initial_quantity')
+    MonthlyAnimalSummary.objects.apply_deltas({key: {'batch_count': -1, **{f: -v for f, v in totals.items()}}})
+
+
+# Password resets, deactivation and any other user edit must not be served from the auth cache
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
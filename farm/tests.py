@@ -1,6 +1,35 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import re
+import tempfile
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+from io import StringIO
+from unittest import mock
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.urls import URLResolver, get_resolver
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.contrib.auth import get_user_model
-from .models import AnimalType, Batch, Expense, MortalityRecord
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from .authentication import user_cache_key
+from .imports import CsvImporter
+from .models import (AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, ShopItem, MonthlyAnimalSummary,
+                     BatchDailySnapshot, SerialCounter, MortalityRecordQuerySet, MonthlySummaryQuerySet,
+                     deferred_batches)
 
 User = get_user_model()
 
@@ -22,3 +51,1046 @@ class BasicModelTests(TestCase):
         mr.approve(self.admin)
         b.refresh_from_db()
         self.assertEqual(b.current_quantity, 8)
+
+
+class SerialAllocationTests(TestCase):
+    def setUp(self):
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+    def test_same_day_and_quantity_get_distinct_serials(self):
+        serials = [Batch.objects.create(animal=self.at, arrival_date='2025-05-01', initial_quantity=10).serial_number
+                   for _ in range(3)]
+        self.assertEqual(serials, ['BATCH-20250501-1', 'BATCH-20250501-2', 'BATCH-20250501-3'])
+        self.assertEqual(SerialCounter.objects.allocate(date(2025, 5, 1), 2), ['BATCH-20250501-4', 'BATCH-20250501-5'])
+        self.assertEqual(SerialCounter.objects.allocate(date(2025, 5, 2)), ['BATCH-20250502-1'])
+    def test_hand_written_serials_move_the_counter(self):
+        Batch.objects.create(animal=self.at, arrival_date='2025-05-01', initial_quantity=10,
+                             serial_number='BATCH-20250501-40')
+        Batch.objects.create(animal=self.at, arrival_date='2025-05-01', initial_quantity=10, serial_number='LEGACY-7')
+        Batch.objects.create(animal=self.at, arrival_date='2025-05-01', initial_quantity=10,
+                             serial_number='BATCH-20251301-90')
+        nxt = Batch.objects.create(animal=self.at, arrival_date='2025-05-01', initial_quantity=40)
+        self.assertEqual(nxt.serial_number, 'BATCH-20250501-41')
+
+
+class CostLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10, created_by=self.user)
+    def test_totals_follow_create_edit_delete(self):
+        e = Expense.objects.create(batch=self.b, description='vet', amount='100.00')
+        f = FeedingRecord.objects.create(batch=self.b, bags=2, amount='50.00')
+        e.amount = Decimal('80.00')
+        e.save()
+        self.b.refresh_from_db()
+        self.assertEqual((self.b.expenses_total, self.b.feed_total, self.b.feed_bags_total), (Decimal('80.00'), Decimal('50.00'), 2))
+        f.delete()
+        Expense.objects.filter(pk=e.pk).delete()
+        self.b.refresh_from_db()
+        self.assertEqual((self.b.expenses_total, self.b.feed_total, self.b.feed_bags_total), (0, 0, 0))
+    def test_deletes_settle_each_batch_once(self):
+        other = Batch.objects.create(animal=self.at, arrival_date='2025-11-21', initial_quantity=5)
+        def fill(n, batches=(self.b, other)):
+            for batch in batches:
+                for i in range(n):
+                    Expense.objects.create(batch=batch, description='vet', amount='2.00')
+                    FeedingRecord.objects.create(batch=batch, bags=1, amount='3.00')
+                    MortalityRecord.objects.create(batch=batch, count=1).approve(self.user)
+        counts = []
+        for n in (2, 6):
+            fill(n)
+            with CaptureQueriesContext(connection) as ctx:
+                Expense.objects.all().delete()
+                FeedingRecord.objects.filter(batch=self.b).delete()
+                MortalityRecord.objects.filter(batch=self.b).delete()
+            counts.append(len(ctx.captured_queries))
+            self.b.refresh_from_db()
+            other.refresh_from_db()
+            self.assertEqual((self.b.expenses_total, self.b.feed_total, self.b.feed_bags_total), (0, 0, 0))
+            self.assertEqual((other.expenses_total, other.feed_bags_total), (0, n))
+            FeedingRecord.objects.all().delete()
+            MortalityRecord.objects.all().delete()
+        self.assertEqual(counts[0], counts[1])
+        fill(2, [other])
+        fill(6, [self.b])
+        ShopItem.objects.create(batch=other)
+        ShopItem.objects.create(batch=self.b)
+        with CaptureQueriesContext(connection) as small:
+            Batch.objects.filter(pk=other.pk).delete()
+        with CaptureQueriesContext(connection) as large:
+            Batch.objects.filter(pk=self.b.pk).delete()
+        self.assertEqual(len(small), len(large))
+        self.assertFalse(MonthlyAnimalSummary.objects.exclude(batch_count=0, heads_in=0, deaths=0, expenses_total=0,
+                                                              feed_total=0, feed_bags_total=0).exists())
+    def test_failed_batch_delete_leaves_nothing_deferred(self):
+        expense = Expense.objects.create(batch=self.b, description='vet', amount='4.00')
+        with mock.patch.object(MonthlySummaryQuerySet, 'apply_deltas', side_effect=RuntimeError('db gone')):
+            with self.assertRaises(RuntimeError):
+                self.b.delete()
+            with self.assertRaises(RuntimeError):
+                Batch.objects.filter(pk=self.b.pk).delete()
+        self.assertEqual(deferred_batches(), set())
+        expense.delete()
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.expenses_total, 0)
+    def test_batch_save_keeps_ledger(self):
+        stale = Batch.objects.get(pk=self.b.pk)
+        Expense.objects.create(batch=self.b, description='vet', amount='10.00')
+        stale.save()
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.expenses_total, Decimal('10.00'))
+    def test_reconcile_rebuilds_drift(self):
+        Expense.objects.create(batch=self.b, description='vet', amount='10.00')
+        Batch.objects.filter(pk=self.b.pk).update(expenses_total=0)
+        call_command('reconcile_batch_costs', stdout=StringIO())
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.expenses_total, Decimal('10.00'))
+
+
+class BatchListQueryTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def make_batches(self, n):
+        for i in range(n):
+            b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=100 + Batch.objects.count(), created_by=self.user)
+            Expense.objects.create(batch=b, description='vet', amount='30.50')
+            FeedingRecord.objects.create(batch=b, bags=1, amount='20.25')
+    def test_list_is_one_select_per_page(self):
+        self.make_batches(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/batches/')
+        self.make_batches(8)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/batches/')
+        self.assertEqual(len(small), len(large))
+        row = next(r for r in response.json()['results'] if r['initial_quantity'] == 100)
+        self.assertEqual(row['total_cost'], 50.75)
+        self.assertEqual(row['unit_cost'], 0.5075)
+        self.assertEqual(row['animal']['code'], 'fish')
+
+
+class BulkRecordTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b1 = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        self.b2 = Batch.objects.create(animal=self.at, arrival_date='2025-11-21', initial_quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def test_mixed_records_with_rejections(self):
+        records = [
+            {'type': 'expense', 'batch': self.b1.pk, 'description': 'vet', 'amount': '15.00'},
+            {'type': 'feeding', 'batch': self.b2.pk, 'bags': 3, 'amount': '40.00'},
+            {'type': 'mortality', 'batch': self.b2.pk, 'count': 1},
+            {'type': 'expense', 'batch': 999, 'description': 'x', 'amount': '1.00'},
+            {'type': 'harvest', 'batch': self.b1.pk},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/records/bulk/', {'records': records}, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.json()['results']], ['created'] * 3 + ['invalid'] * 2)
+        self.assertLess(len(ctx), 15)
+        self.b1.refresh_from_db()
+        self.b2.refresh_from_db()
+        self.assertEqual(self.b1.expenses_total, Decimal('15.00'))
+        self.assertEqual((self.b2.feed_total, self.b2.feed_bags_total), (Decimal('40.00'), 3))
+        self.assertEqual(Expense.objects.get().recorded_by, self.user)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def post_gzip(self, records):
+        body = gzip.compress(json.dumps({'records': records}).encode())
+        return self.client.generic('POST', '/api/sync/', body, content_type='application/json', HTTP_CONTENT_ENCODING='gzip')
+    def test_replayed_keys_are_not_inserted_twice(self):
+        key = str(uuid.uuid4())
+        records = [
+            {'key': key, 'type': 'expense', 'batch': self.b.pk, 'description': 'vet', 'amount': '15.00'},
+            {'key': key, 'type': 'expense', 'batch': self.b.pk, 'description': 'vet', 'amount': '15.00'},
+        ]
+        first = self.post_gzip(records).json()['results']
+        second = self.post_gzip(records[:1]).json()['results']
+        self.assertEqual([r['status'] for r in first], ['created', 'duplicate'])
+        self.assertEqual(second[0]['status'], 'duplicate')
+        self.assertEqual(second[0]['id'], first[0]['id'])
+        self.assertEqual(Expense.objects.count(), 1)
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.expenses_total, Decimal('15.00'))
+        self.client.force_authenticate(User.objects.create_user('v','v@example.com','pass'))
+        other = self.post_gzip(records[:1]).json()['results']
+        self.assertEqual(other[0]['status'], 'created')
+        self.assertNotEqual(other[0]['id'], first[0]['id'])
+    def test_missing_key_is_rejected(self):
+        response = self.client.post('/api/sync/', {'records': [{'type': 'mortality', 'batch': self.b.pk, 'count': 1}]}, format='json')
+        self.assertEqual(response.json()['results'][0]['status'], 'invalid')
+        self.assertFalse(MortalityRecord.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        for i in range(7):
+            Batch.objects.create(animal=self.at, arrival_date=f'2025-11-2{i % 3}', initial_quantity=10 + i)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def test_pages_walk_forward_and_back_without_count(self):
+        expected = list(Batch.objects.order_by('-arrival_date', '-id').values_list('id', flat=True))
+        seen, url, pages = [], '/api/batches/?page_size=3', []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(url).json()
+            self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+            pages.append(data)
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(seen, expected)
+        back = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual([row['id'] for row in back['results']], expected[3:6])
+    def test_bad_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/batches/?cursor=nonsense').status_code, 404)
+
+
+class BulkApproveTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b1 = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        self.b2 = Batch.objects.create(animal=self.at, arrival_date='2025-11-21', initial_quantity=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    def test_one_decrement_per_batch_and_floor_at_zero(self):
+        ids = [MortalityRecord.objects.create(batch=b, count=c).pk for b, c in [(self.b1, 2), (self.b1, 3), (self.b2, 4)]]
+        done = MortalityRecord.objects.create(batch=self.b1, count=1)
+        done.approve(self.admin)
+        response = self.client.post('/api/mortalities/bulk_approve/', {'ids': ids + [done.pk]}, format='json')
+        self.assertEqual(response.json()['approved'], 3)
+        self.b1.refresh_from_db()
+        self.b2.refresh_from_db()
+        self.assertEqual((self.b1.current_quantity, self.b2.current_quantity), (4, 0))
+        self.assertFalse(MortalityRecord.objects.filter(approved=False).exists())
+        self.assertEqual(MortalityRecord.objects.filter(approved=False).approve(self.admin), 0)
+    def test_lost_races_are_not_counted(self):
+        first, second = (MortalityRecord.objects.create(batch=self.b1, count=c) for c in (2, 3))
+        stale = MortalityRecord.objects.filter(pk__in=[first.pk, second.pk]).pending_rows()
+        # A concurrent approver takes the first record after this one read the pending rows
+        self.assertTrue(MortalityRecord.objects.get(pk=first.pk).approve(self.admin))
+        self.assertFalse(MortalityRecord.objects.get(pk=first.pk).approve(self.admin))
+        with mock.patch.object(MortalityRecordQuerySet, 'pending_rows', return_value=stale):
+            self.assertEqual(MortalityRecord.objects.all().approve(self.admin), 1)
+        self.b1.refresh_from_db()
+        self.assertEqual(self.b1.current_quantity, 10 - 2 - 3)
+        self.assertEqual(self.client.post(f'/api/mortalities/{first.pk}/approve/').status_code, 400)
+    def test_deaths_come_from_the_approved_rows(self):
+        single = MortalityRecord.objects.create(batch=self.b1, count=1)
+        bulk = MortalityRecord.objects.create(batch=self.b1, count=1)
+        stale = MortalityRecord.objects.filter(pk=bulk.pk).pending_rows()
+        # Counts corrected after the approvers loaded the records
+        MortalityRecord.objects.filter(pk__in=[single.pk, bulk.pk]).update(count=3)
+        self.assertTrue(single.approve(self.admin))
+        self.assertEqual(single.count, 3)
+        with mock.patch.object(MortalityRecordQuerySet, 'pending_rows', return_value=stale):
+            self.assertEqual(MortalityRecord.objects.all().approve(self.admin), 1)
+        self.b1.refresh_from_db()
+        self.assertEqual(self.b1.current_quantity, 10 - 3 - 3)
+        self.assertEqual(MonthlyAnimalSummary.objects.get().deaths, 6)
+    def test_batch_row_is_written_before_the_summary(self):
+        record = MortalityRecord.objects.create(batch=self.b1, count=2)
+        with CaptureQueriesContext(connection) as ctx:
+            record.approve(self.admin)
+        writes = [q['sql'].split('"')[1] for q in ctx.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertLess(writes.index('farm_batch'), writes.index('farm_monthlyanimalsummary'))
+
+
+class BulkMoveToShopTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    def test_locks_costs_and_creates_shop_items(self):
+        b1 = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=4)
+        b2 = Batch.objects.create(animal=self.at, arrival_date='2025-11-21', initial_quantity=10)
+        Expense.objects.create(batch=b1, description='vet', amount='10.00')
+        FeedingRecord.objects.create(batch=b1, bags=1, amount='6.00')
+        b2.move_to_shop(by_user=self.admin)
+        response = self.client.post('/api/batches/bulk_move_to_shop/', {'ids': [b1.pk, b2.pk]}, format='json')
+        self.assertEqual(response.json()['moved'], 1)
+        b1.refresh_from_db()
+        self.assertEqual((b1.locked_total_cost, b1.locked_unit_cost), (Decimal('16.00'), Decimal('4.0000')))
+        self.assertTrue(b1.is_moved_to_shop)
+        self.assertEqual(ShopItem.objects.filter(batch__in=[b1, b2]).count(), 2)
+        with self.assertRaises(ValueError):
+            b1.move_to_shop()
+
+
+class MonthlySummaryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    def snapshot(self):
+        return list(MonthlyAnimalSummary.objects.order_by('animal_id', 'month').values())
+    def test_editing_approved_record_moves_its_deaths(self):
+        b1 = Batch.objects.create(animal=self.at, arrival_date='2025-11-01', initial_quantity=10)
+        b2 = Batch.objects.create(animal=self.at, arrival_date='2025-12-01', initial_quantity=10)
+        record = MortalityRecord.objects.create(batch=b1, count=2)
+        record.approve(self.admin)
+        record.count = 5
+        record.save()
+        deaths = lambda: list(MonthlyAnimalSummary.objects.order_by('month').values_list('deaths', flat=True))
+        self.assertEqual(deaths(), [5, 0])
+        record.batch = b2
+        record.save()
+        self.assertEqual(deaths(), [0, 5])
+        self.assertEqual(list(Batch.objects.order_by('pk').values_list('current_quantity', flat=True)), [10, 5])
+        MonthlyAnimalSummary.objects.rebuild()
+        self.assertEqual(deaths(), [0, 5])
+    def test_incremental_matches_rebuild(self):
+        turkey = AnimalType.objects.create(code='turkey', name='Turkey')
+        b1 = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        b2 = Batch.objects.create(animal=self.at, arrival_date='2025-11-03', initial_quantity=5)
+        b3 = Batch.objects.create(animal=turkey, arrival_date='2025-12-01', initial_quantity=8)
+        Expense.objects.create(batch=b1, description='vet', amount='100.00')
+        FeedingRecord.objects.create(batch=b2, bags=2, amount='50.00')
+        MortalityRecord.objects.create(batch=b1, count=2).approve(self.admin)
+        self.client.post('/api/records/bulk/', {'records': [
+            {'type': 'expense', 'batch': b3.pk, 'description': 'x', 'amount': '7.00'}]}, format='json')
+        b2.arrival_date = '2025-12-15'
+        b2.animal = turkey
+        b2.save()
+        Batch.objects.filter(pk=b3.pk).delete()
+        incremental = [{k: v for k, v in row.items() if k != 'id'} for row in self.snapshot()]
+        MonthlyAnimalSummary.objects.rebuild()
+        rebuilt = [{k: v for k, v in row.items() if k != 'id'} for row in self.snapshot()]
+        self.assertEqual([r for r in incremental if r['batch_count']], rebuilt)
+        rows = self.client.get('/api/analytics/monthly/?from=2025-11&to=2025-11').json()
+        self.assertEqual(self.client.get('/api/analytics/monthly/?animal=abc').status_code, 400)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['cost_per_head'], rows[0]['mortality_rate']), ('10.00', '0.2000'))
+
+
+class VersionedBatchCacheTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def test_child_writes_bump_version(self):
+        versions = [self.b.version]
+        for write in (
+            lambda: Expense.objects.create(batch=self.b, description='vet', amount='1.00'),
+            lambda: MortalityRecord.objects.create(batch=self.b, count=1),
+            lambda: MortalityRecord.objects.get().approve(self.admin_user()),
+            lambda: ShopItem.objects.create(batch=self.b),
+            lambda: self.b.save(),
+        ):
+            write()
+            versions.append(Batch.objects.get(pk=self.b.pk).version)
+        self.assertEqual(versions, sorted(set(versions)))
+    def admin_user(self):
+        return User.objects.create_superuser('admin','a@a.com','pass')
+    def test_etag_round_trip(self):
+        url = f'/api/batches/{self.b.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        listed = self.client.get('/api/batches/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/batches/', HTTP_IF_NONE_MATCH=listed['ETag']).status_code, 304)
+        FeedingRecord.objects.create(batch=self.b, bags=1, amount='5.00')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['total_feed'], 5.0)
+        self.assertEqual(self.client.get('/api/batches/', HTTP_IF_NONE_MATCH=listed['ETag']).status_code, 200)
+    def test_malformed_pk_is_not_found(self):
+        self.assertEqual(self.client.get('/api/batches/abc/').status_code, 404)
+    def test_animal_rename_bumps_version(self):
+        url = f'/api/batches/{self.b.pk}/'
+        first = self.client.get(url)
+        self.at.name = 'Catfish'
+        self.at.save()
+        renamed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(renamed.json()['animal_name'], 'Catfish')
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        Expense.objects.create(batch=self.b, description='vet', amount='2.50')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def test_fields_trim_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = self.client.get('/api/batches/?fields=serial_number,animal_name,current_quantity').json()['results']
+        self.assertEqual(rows, [{'id': self.b.pk, 'animal_name': 'Fish', 'serial_number': self.b.serial_number,
+                                 'current_quantity': 10}])
+        loaded = ctx.captured_queries[-1]['sql']
+        self.assertIn('"farm_animaltype"."name"', loaded)
+        self.assertNotIn('expenses_total', loaded)
+        self.assertNotIn('initial_quantity', loaded)
+        costs = self.client.get(f'/api/batches/{self.b.pk}/?fields=unit_cost&expand=animal').json()
+        self.assertEqual(costs, {'id': self.b.pk, 'unit_cost': 0.25,
+                                 'animal': {'id': self.at.pk, 'code': 'fish', 'name': 'Fish'}})
+        self.assertNotIn('animal', self.client.get(f'/api/batches/{self.b.pk}/?expand=').json())
+        self.assertIn('animal', self.client.get(f'/api/batches/{self.b.pk}/').json())
+    def test_variants_are_cached_and_tagged_apart(self):
+        url = f'/api/batches/{self.b.pk}/'
+        full = self.client.get(url)
+        sparse = self.client.get(url + '?fields=serial_number')
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+        self.assertEqual(self.client.get(url + '?fields=serial_number', HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 200)
+        self.assertEqual(len(self.client.get(url).json()), len(full.json()))
+        bad = self.client.get('/api/batches/?fields=serial_number,secret&expand=shop')
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(set(bad.json()), {'fields', 'expand'})
+
+
+class BatchFullDetailTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        self.expenses = [Expense.objects.create(batch=self.b, description=f'e{i}', amount='1.25', recorded_by=self.user)
+                         for i in range(3)]
+        FeedingRecord.objects.create(batch=self.b, bags=1, amount='3.50')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def test_embedded_pages_continue_in_list_endpoints(self):
+        self.assertEqual(self.client.get('/api/batches/abc/full/').status_code, 404)
+        url = f'/api/batches/{self.b.pk}/full/?limit=2'
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['batch']['total_expenses'], 3.75)
+        self.assertEqual([e['description'] for e in data['expenses']['results']], ['e2', 'e1'])
+        rest = self.client.get(data['expenses']['next']).json()
+        self.assertEqual([e['id'] for e in rest['results']], [self.expenses[0].pk])
+        self.assertEqual((len(data['feedings']['results']), data['feedings']['next']), (1, None))
+        self.assertEqual(data['mortalities'], {'next': None, 'results': []})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        MortalityRecord.objects.create(batch=self.b, count=1)
+        self.assertEqual(len(self.client.get(url).json()['mortalities']['results']), 1)
+        self.assertEqual(self.client.get(f'/api/batches/{self.b.pk}/full/?limit=x').status_code, 400)
+
+
+class ShopCatalogTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b1 = Batch.objects.create(animal=self.at, arrival_date='2025-11-01', initial_quantity=10)
+        self.b2 = Batch.objects.create(animal=self.at, arrival_date='2025-11-02', initial_quantity=5)
+        Batch.objects.filter(pk__in=[self.b1.pk, self.b2.pk]).move_to_shop()
+        self.item = ShopItem.objects.get(batch=self.b1)
+        self.item.selling_price_per_unit = Decimal('12.50')
+        self.item.save()
+        self.client = APIClient()
+    def catalog(self):
+        return [(row['serial_number'], row['available'], row['price'])
+                for row in self.client.get('/api/catalog/').json()['items']]
+    def test_public_reads_come_from_the_snapshot(self):
+        self.assertEqual(self.catalog(), [(self.b1.serial_number, 10, '12.50')])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/catalog/')
+        self.assertEqual(self.client.get('/api/catalog/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    def test_writes_rebuild_the_snapshot(self):
+        self.catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            MortalityRecord.objects.create(batch=self.b1, count=3).approve(self.admin)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.catalog(), [(self.b1.serial_number, 7, '12.50')])
+        self.client.force_authenticate(self.admin)
+        item = ShopItem.objects.get(batch=self.b2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/shop/{item.pk}/set_price/', {'selling_price_per_unit': '3.00'}, format='json')
+        self.assertEqual([row[2] for row in self.catalog()], ['3.00', '12.50'])
+        b3 = Batch.objects.create(animal=self.at, arrival_date='2025-11-03', initial_quantity=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            b3.move_to_shop()
+            ShopItem.objects.filter(batch=b3).get().delete()
+            ShopItem.objects.get(batch=self.b1).delete()
+        self.assertEqual(len(self.catalog()), 1)
+
+
+class ShopRepriceTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.fish = AnimalType.objects.create(code='fish', name='Fish')
+        self.goat = AnimalType.objects.create(code='goat', name='Goat')
+        batches = [Batch.objects.create(animal=animal, arrival_date='2025-11-01', initial_quantity=3)
+                   for animal in (self.fish, self.fish, self.goat)]
+        Expense.objects.create(batch=batches[0], description='feed', amount='10.00')
+        Expense.objects.create(batch=batches[2], description='feed', amount='20.00')
+        Batch.objects.filter(pk__in=[b.pk for b in batches]).move_to_shop()
+        self.items = [ShopItem.objects.get(batch=b) for b in batches]   # locked costs 3.3333, 0, 6.6667
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    def prices(self):
+        return [str(item.selling_price_per_unit) for item in ShopItem.objects.order_by('pk')]
+    def test_explicit_prices_reject_at_or_below_cost(self):
+        fish, free, goat = self.items
+        version = Batch.objects.get(pk=fish.batch_id).version
+        response = self.client.post('/api/shop/bulk_reprice/', {'prices': [
+            {'id': fish.pk, 'price': '3.33'}, {'id': free.pk, 'price': '1.10'}, {'id': goat.pk, 'price': '7.00'},
+            {'id': 999999, 'price': '5.00'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual([(row['id'], row['detail']) for row in response.json()['rejected']], [
+            (fish.pk, 'selling price must be greater than locked unit cost'), (999999, 'shop item not found')])
+        self.assertEqual(self.prices(), ['None', '1.10', '7.00'])
+        self.assertEqual(Batch.objects.get(pk=fish.batch_id).version, version)
+        self.assertEqual(Batch.objects.get(pk=goat.batch_id).version, version + 1)
+    def test_markup_is_rounded_in_decimal_and_filtered_by_animal(self):
+        with self.assertNumQueries(5):   # savepoint, select, update, touch, release
+            response = self.client.post('/api/shop/bulk_reprice/', {'markup_percent': '10', 'animal': self.fish.pk},
+                                        format='json')
+        self.assertEqual(response.status_code, 207)
+        # 3.3333 * 1.10 = 3.66663 -> 3.67; a zero cost marks up to 0.00, which is not above cost
+        self.assertEqual(response.json()['items'], [{'id': self.items[0].pk, 'selling_price_per_unit': '3.67'}])
+        self.assertEqual(self.prices(), ['3.67', 'None', 'None'])
+        response = self.client.post('/api/shop/bulk_reprice/', {'markup_percent': '10', 'prices': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+    def test_set_price_uses_decimal(self):
+        goat = self.items[2]
+        response = self.client.post(f'/api/shop/{goat.pk}/set_price/', {'selling_price_per_unit': '6.6667'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'/api/shop/{goat.pk}/set_price/', {'selling_price_per_unit': '6.67'},
+                                    format='json')
+        self.assertEqual(response.json(), {'detail': 'price set', 'selling_price_per_unit': '6.67'})
+        self.assertEqual(self.client.post(f'/api/shop/{goat.pk}/set_price/', {'selling_price_per_unit': 'x'},
+                                          format='json').status_code, 400)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        caches['auth'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.token = str(AccessToken.for_user(self.user))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+    def count_user_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/mortalities/')
+        return response.status_code, sum('FROM "auth_user"' in q['sql'] for q in ctx.captured_queries)
+    def test_user_is_cached_until_saved(self):
+        self.assertEqual(self.count_user_queries(), (200, 1))
+        self.assertEqual(self.count_user_queries(), (200, 0))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.count_user_queries(), (401, 1))
+    def test_cache_is_shared_between_workers(self):
+        # A per-process cache would keep serving a user another worker deactivated
+        self.assertNotIsInstance(caches['auth'], LocMemCache)
+        self.count_user_queries()
+        self.assertIsNotNone(caches.create_connection('auth').get(user_cache_key(self.user.pk)))
+        self.user.set_password('reset')
+        self.user.save()
+        self.assertIsNone(caches.create_connection('auth').get(user_cache_key(self.user.pk)))
+    def test_tests_do_not_write_to_the_project_cache(self):
+        self.assertNotEqual(settings.CACHES['auth']['LOCATION'], settings.AUTH_CACHE_DIR)
+        self.assertTrue(settings.CACHES['auth']['LOCATION'].startswith(tempfile.gettempdir()))
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        b = Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        Expense.objects.create(batch=b, description='vet', amount='12.50')
+        MortalityRecord.objects.create(batch=b, count=1)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+    def test_async_payloads_match_viewsets(self):
+        for sync_url, async_url in [('/api/batches/', '/api/async/batches/'),
+                                    ('/api/mortalities/', '/api/async/mortalities/')]:
+            expected = self.client.get(sync_url, **self.auth)
+            actual = self.client.get(async_url, **self.auth)
+            self.assertEqual(actual.status_code, 200)
+            self.assertEqual(actual.json(), expected.json())
+        pk = Batch.objects.get().pk
+        detail = self.client.get(f'/api/async/batches/{pk}/', **self.auth)
+        self.assertEqual(self.client.get(f'/api/async/batches/{pk}/', HTTP_IF_NONE_MATCH=detail['ETag'], **self.auth).status_code, 304)
+    def test_async_auth_and_permissions(self):
+        self.assertEqual(self.client.get('/api/async/batches/').status_code, 401)
+        self.assertEqual(self.client.get('/api/async/shop/', **self.auth).status_code, 403)
+
+
+class ReleaseCheckTests(TestCase):
+    def test_migrations_are_current(self):
+        from core.release import pending_migrations
+        self.assertEqual(pending_migrations(), [])
+    def test_static_manifest_checked_without_recollecting(self):
+        from core.release import stale_static
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            self.assertEqual(stale_static(), ['staticfiles.json'])
+            with self.assertRaises(CommandError):
+                call_command('check_release', stdout=StringIO())
+            call_command('check_release', '--apply', stdout=StringIO())
+            self.assertEqual(stale_static(), [])
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        Batch.objects.create(animal=self.at, arrival_date='2025-11-20', initial_quantity=10)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+    def test_server_timing_reports_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/batches/', **self.auth)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+    @override_settings(PERF_QUERY_COUNT_THRESHOLD=1)
+    def test_requests_over_threshold_log_queries(self):
+        with self.assertLogs('farm.perf', 'WARNING') as logs:
+            self.client.get('/api/batches/', **self.auth)
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['path'], '/api/batches/')
+        self.assertTrue(entry['slowest_queries'])
+        self.assertIn('duplicated_queries', entry)
+
+
+class LoadTestToolingTests(TestCase):
+    def test_seed_farm_keeps_ledgers_consistent(self):
+        call_command('seed_farm', batches=20, expenses=60, feedings=60, mortalities=30, seed=1, stdout=StringIO())
+        self.assertEqual(Batch.objects.count(), 20)
+        self.assertEqual(MortalityRecord.objects.count(), 30)
+        call_command('reconcile_batch_costs', check=True, stdout=StringIO())
+        self.assertEqual(sum(MonthlyAnimalSummary.objects.values_list('batch_count', flat=True)), 20)
+        self.assertFalse(MortalityRecord.objects.filter(approved=True, approved_at__isnull=True).exists())
+    def test_benchmark_writes_json_report(self):
+        caches['batches'].clear()
+        User.objects.create_superuser('admin','a@example.com','pass')
+        call_command('seed_farm', batches=5, expenses=10, feedings=10, mortalities=5, seed=2, stdout=StringIO())
+        with tempfile.NamedTemporaryFile(suffix='.json') as fh:
+            call_command('benchmark_api', iterations=3, warmup=0, output=fh.name, stdout=StringIO())
+            report = json.load(open(fh.name))
+        batch_list = report['endpoints']['batch-list']
+        self.assertEqual(batch_list['status'], 200)
+        self.assertLessEqual(batch_list['p50_ms'], batch_list['p99_ms'])
+        self.assertGreater(batch_list['queries_per_request'], 0)
+
+
+@override_settings(STORAGES={"staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}})
+class QueryBudgetTests(TestCase):
+    """
+    Every route in farm/urls.py and the custom admin views, measured at two data
+    sizes: the query count may not grow with row count and may not exceed its
+    budget. A new route fails test_every_route_is_budgeted until it has a case.
+    """
+    SIZES = (2, 6)
+    BUDGETS = {
+        'api-root': 1,
+        'animaltype-list': 3, 'animaltype-detail': 2,
+        'batch-list': 3, 'batch-detail': 3, 'batch-full': 6, 'batch-timeseries': 3,
+        'batch-expense': 9, 'batch-feeding': 9, 'batch-mortality': 7,
+        'batch-move-to-shop': 9, 'batch-bulk-move-to-shop': 6,
+        'expense-list': 2, 'expense-detail': 2, 'feeding-list': 2, 'feeding-detail': 2,
+        'mortality-list': 2, 'mortality-detail': 2, 'mortality-approve': 14, 'mortality-bulk-approve': 12,
+        'shop-list': 2, 'shop-detail': 2, 'shop-set-price': 7, 'shop-bulk-reprice': 7, 'shop-catalog': 1,
+        'analytics-monthly-list': 2, 'analytics-monthly-detail': 2,
+        'records-bulk': 8, 'sync': 12, 'export': 2,
+        # Writes on the ModelViewSet detail routes (records are read-only over the API); the batch
+        # delete cascades over n rows of every child table, the animal rename touches n batches
+        'batch-detail:put': 9, 'batch-detail:patch': 8, 'batch-detail:delete': 15,
+        'animaltype-detail:put': 5, 'animaltype-detail:patch': 4, 'animaltype-detail:delete': 6,
+        'shop-detail:put': 8, 'shop-detail:patch': 6, 'shop-detail:delete': 4,
+        'async-batch-list': 3, 'async-batch-detail': 3, 'async-mortality-list': 2, 'async-shop-list': 2,
+        'register': 5, 'token_obtain_pair': 1, 'token_refresh': 1,
+        'admin:farm_batch_changelist': 5, 'admin:farm_batch_change': 9, 'admin:batch-report': 6,
+        'admin:batch-import': 3,
+        'admin:farm_expense_changelist': 5, 'admin:farm_feedingrecord_changelist': 5,
+        'admin:farm_mortalityrecord_changelist': 5, 'admin:farm_shopitem_changelist': 5,
+        'admin:farm_animaltype_changelist': 5,
+        'admin-action:approve_mortalities': 15, 'admin-action:move_batches_to_shop': 9,
+    }
+
+    def setUp(self):
+        self.day = lambda offset: date(2025, 1, 1) + timedelta(days=offset)
+        self.admin = User.objects.create_superuser('admin','a@example.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.admin)}'}
+        self.client.force_login(self.admin)
+
+    def build(self, n):
+        """n open batches, n moved to the shop; the first batch carries n of every child row."""
+        batches = [Batch.objects.create(animal=self.at, arrival_date=self.day(i), initial_quantity=100) for i in range(n)]
+        moved = [Batch.objects.create(animal=self.at, arrival_date=self.day(100 + i), initial_quantity=50) for i in range(n)]
+        head = batches[0]
+        for i in range(n):
+            Expense.objects.create(batch=head, description='vet', amount='10.50', recorded_by=self.admin)
+            FeedingRecord.objects.create(batch=head, bags=1, amount='20.25', recorded_by=self.admin)
+            MortalityRecord.objects.create(batch=head, count=1)
+        approved = [MortalityRecord.objects.create(batch=head, count=1).pk for i in range(n)]
+        MortalityRecord.objects.filter(pk__in=approved).approve(self.admin)
+        Batch.objects.filter(pk__in=[b.pk for b in moved]).move_to_shop(by_user=self.admin)
+        BatchDailySnapshot.objects.refresh(BatchDailySnapshot.objects.stale_batches())
+        pending = list(MortalityRecord.objects.filter(approved=False).values_list('pk', flat=True))
+        return batches, pending, list(ShopItem.objects.values_list('pk', flat=True))
+
+    def cases(self, n):
+        batches, pending, shop = self.build(n)
+        head, ids = batches[0].pk, [b.pk for b in batches]
+        records = [{'type': 'expense', 'batch': pk, 'description': 'vet', 'amount': '1.50'} for pk in ids]
+        keyed = [dict(record, key=str(uuid.UUID(int=i + 1))) for i, record in enumerate(records)]
+        summary = MonthlyAnimalSummary.objects.values_list('pk', flat=True).first()
+        expense = Expense.objects.values_list('pk', flat=True).first()
+        feeding = FeedingRecord.objects.values_list('pk', flat=True).first()
+        moved = ShopItem.objects.values_list('batch', flat=True).get(pk=shop[0])
+        unused = AnimalType.objects.create(code='unused', name='Unused').pk
+        return {
+            'api-root': ('get', '/api/', None),
+            'animaltype-list': ('get', '/api/animal-types/', None),
+            'animaltype-detail': ('get', f'/api/animal-types/{self.at.pk}/', None),
+            'batch-list': ('get', f'/api/batches/?animal={self.at.pk}&is_moved_to_shop=false', None),
+            'batch-detail': ('get', f'/api/batches/{head}/', None),
+            'batch-full': ('get', f'/api/batches/{head}/full/?limit=2', None),
+            'batch-timeseries': ('get', f'/api/batches/{head}/timeseries/?from=2025-01-01', None),
+            'batch-expense': ('post', f'/api/batches/{head}/expense/', {'description': 'vet', 'amount': '1.50'}),
+            'batch-feeding': ('post', f'/api/batches/{head}/feeding/', {'bags': 1, 'amount': '1.50'}),
+            'batch-mortality': ('post', f'/api/batches/{head}/mortality/', {'count': 1}),
+            'batch-move-to-shop': ('post', f'/api/batches/{head}/move_to_shop/', {}),
+            'batch-bulk-move-to-shop': ('post', '/api/batches/bulk_move_to_shop/', {'ids': ids}),
+            'expense-list': ('get', f'/api/expenses/?batch={head}&created_after=2025-01-01', None),
+            'expense-detail': ('get', f'/api/expenses/{expense}/', None),
+            'feeding-list': ('get', f'/api/feedings/?batch={head}', None),
+            'feeding-detail': ('get', f'/api/feedings/{feeding}/', None),
+            'mortality-list': ('get', '/api/mortalities/?approved=false', None),
+            'mortality-detail': ('get', f'/api/mortalities/{pending[0]}/', None),
+            'mortality-approve': ('post', f'/api/mortalities/{pending[0]}/approve/', {}),
+            'mortality-bulk-approve': ('post', '/api/mortalities/bulk_approve/', {'ids': pending}),
+            'shop-list': ('get', '/api/shop/', None),
+            'shop-catalog': ('get', '/api/catalog/', None),
+            'shop-detail': ('get', f'/api/shop/{shop[0]}/', None),
+            'shop-set-price': ('post', f'/api/shop/{shop[0]}/set_price/', {'selling_price_per_unit': '999.00'}),
+            'shop-bulk-reprice': ('post', '/api/shop/bulk_reprice/', {'prices': [{'id': pk, 'price': '999.00'} for pk in shop]}),
+            'batch-detail:put': ('put', f'/api/batches/{head}/', {
+                'animal_id': self.at.pk, 'arrival_date': '2025-01-01', 'initial_quantity': 120}),
+            'batch-detail:patch': ('patch', f'/api/batches/{head}/', {'initial_quantity': 110}),
+            'batch-detail:delete': ('delete', f'/api/batches/{head}/', None),
+            'animaltype-detail:put': ('put', f'/api/animal-types/{self.at.pk}/', {'code': 'fish', 'name': 'Catfish'}),
+            'animaltype-detail:patch': ('patch', f'/api/animal-types/{self.at.pk}/', {'name': 'Catfish'}),
+            'animaltype-detail:delete': ('delete', f'/api/animal-types/{unused}/', None),
+            'shop-detail:put': ('put', f'/api/shop/{shop[0]}/', {'batch': moved, 'selling_price_per_unit': '999.00'}),
+            'shop-detail:patch': ('patch', f'/api/shop/{shop[0]}/', {'selling_price_per_unit': '999.00'}),
+            'shop-detail:delete': ('delete', f'/api/shop/{shop[0]}/', None),
+            'analytics-monthly-list': ('get', '/api/analytics/monthly/', None),
+            'analytics-monthly-detail': ('get', f'/api/analytics/monthly/{summary}/', None),
+            'records-bulk': ('post', '/api/records/bulk/', {'records': records}),
+            'sync': ('post', '/api/sync/', {'records': keyed}),
+            'export': ('get', f'/api/export/expenses.csv?animal={self.at.pk}&created_after=2025-01-01', None),
+            'async-batch-list': ('get', '/api/async/batches/', None),
+            'async-batch-detail': ('get', f'/api/async/batches/{head}/', None),
+            'async-mortality-list': ('get', '/api/async/mortalities/', None),
+            'async-shop-list': ('get', '/api/async/shop/', None),
+            'register': ('post', '/api/register/', {'username': 'new', 'email': 'new@example.com', 'password': 'secret-pass'}),
+            'token_obtain_pair': ('post', '/api/token/', {'username': 'admin', 'password': 'pass'}),
+            'token_refresh': ('post', '/api/token/refresh/', {'refresh': str(RefreshToken.for_user(self.admin))}),
+            'admin:farm_batch_changelist': ('get', '/admin/farm/batch/', None),
+            'admin:farm_batch_change': ('get', f'/admin/farm/batch/{head}/change/', None),
+            'admin:batch-report': ('get', f'/admin/farm/batch/{head}/report/', None),
+            'admin:batch-import': ('get', '/admin/farm/batch/import/', None),
+            'admin:farm_expense_changelist': ('get', '/admin/farm/expense/', None),
+            'admin:farm_feedingrecord_changelist': ('get', '/admin/farm/feedingrecord/', None),
+            'admin:farm_mortalityrecord_changelist': ('get', '/admin/farm/mortalityrecord/', None),
+            'admin:farm_shopitem_changelist': ('get', '/admin/farm/shopitem/', None),
+            'admin:farm_animaltype_changelist': ('get', '/admin/farm/animaltype/', None),
+            'admin-action:approve_mortalities': ('form', '/admin/farm/mortalityrecord/',
+                                                 {'action': 'approve_mortalities', '_selected_action': pending}),
+            'admin-action:move_batches_to_shop': ('form', '/admin/farm/batch/',
+                                                  {'action': 'move_batches_to_shop', '_selected_action': ids}),
+        }
+
+    def measure(self, name, n):
+        with transaction.atomic():
+            method, url, body = self.cases(n)[name]
+            caches['batches'].clear()
+            caches['auth'].clear()
+            ContentType.objects.clear_cache()
+            with CaptureQueriesContext(connection) as ctx:
+                if method == 'get':
+                    response = self.client.get(url, **self.auth)
+                elif method == 'form':
+                    response = self.client.post(url, body)
+                else:
+                    send = getattr(self.client, method)
+                    response = send(url, json.dumps(body), content_type='application/json', **self.auth)
+                # Streamed bodies run their queries while being consumed
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+            self.assertLess(response.status_code, 400, f'{name}: {response.status_code} {content[:300]}')
+            transaction.set_rollback(True)
+        return [query['sql'] for query in ctx.captured_queries]
+
+    def shape(self, sql):
+        # Literal values and IN-list lengths differ between runs; the statement shape does not
+        sql = re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", '?', sql)
+        return re.sub(r'\(\?(, \?)*\)', '(?)', sql)
+
+    def report(self, queries, baseline=()):
+        grown = Counter(map(self.shape, queries)) - Counter(map(self.shape, baseline))
+        lines = []
+        for sql in queries:
+            marked = grown[self.shape(sql)] > 0
+            lines.append(('  + ' if marked else '    ') + sql)
+        return '\n'.join(lines)
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        for name, budget in self.BUDGETS.items():
+            with self.subTest(route=name):
+                small, large = (self.measure(name, n) for n in self.SIZES)
+                self.assertEqual(len(small), len(large),
+                                 f'{name}: {len(small)} queries for {self.SIZES[0]} rows, {len(large)} for '
+                                 f'{self.SIZES[1]} (+ marks statements that repeat with row count):\n'
+                                 + self.report(large, small))
+                self.assertLessEqual(len(large), budget,
+                                     f'{name}: {len(large)} queries, budget {budget}:\n' + self.report(large))
+
+    def test_every_route_is_budgeted(self):
+        def names(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    if pattern.namespace is None:
+                        yield from names(pattern.url_patterns)
+                elif pattern.name:
+                    yield pattern.name
+
+        routes = set(names(get_resolver('farm.urls').url_patterns))
+        self.assertEqual(routes - set(self.BUDGETS), set())
+
+
+class FilterTests(TestCase):
+    def setUp(self):
+        caches['batches'].clear()
+        self.user = User.objects.create_user('u','u@example.com','pass')
+        self.fish = AnimalType.objects.create(code='fish', name='Fish')
+        self.goat = AnimalType.objects.create(code='goat', name='Goat')
+        self.b1 = Batch.objects.create(animal=self.fish, arrival_date='2025-10-05', initial_quantity=10)
+        self.b2 = Batch.objects.create(animal=self.fish, arrival_date='2025-11-20', initial_quantity=12)
+        self.b3 = Batch.objects.create(animal=self.goat, arrival_date='2025-11-21', initial_quantity=3)
+        self.b3.move_to_shop()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['results']]
+    def test_batch_filters(self):
+        self.assertEqual(self.ids(f'/api/batches/?animal={self.fish.pk}'), [self.b2.pk, self.b1.pk])
+        self.assertEqual(self.ids('/api/batches/?arrival_after=2025-11-01&arrival_before=2025-11-20'), [self.b2.pk])
+        self.assertEqual(self.ids('/api/batches/?is_moved_to_shop=true'), [self.b3.pk])
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        rows = self.client.get('/api/async/batches/?is_moved_to_shop=false', **auth).json()['results']
+        self.assertEqual([row['id'] for row in rows], [self.b2.pk, self.b1.pk])
+        self.assertEqual(self.client.get('/api/batches/?arrival_after=soon').status_code, 400)
+    def test_record_filters(self):
+        e1 = Expense.objects.create(batch=self.b1, description='vet', amount='5.00')
+        Expense.objects.create(batch=self.b2, description='vet', amount='6.00')
+        f1 = FeedingRecord.objects.create(batch=self.b1, bags=1, amount='9.00')
+        m1 = MortalityRecord.objects.create(batch=self.b1, count=1)
+        m2 = MortalityRecord.objects.create(batch=self.b1, count=1)
+        m2.approve(User.objects.create_superuser('admin','a@a.com','pass'))
+        self.assertEqual(self.ids(f'/api/expenses/?batch={self.b1.pk}'), [e1.pk])
+        self.assertEqual(self.ids(f'/api/feedings/?batch={self.b1.pk}'), [f1.pk])
+        self.assertEqual(self.ids(f'/api/mortalities/?batch={self.b1.pk}&approved=false'), [m1.pk])
+        self.assertEqual(self.ids('/api/expenses/?created_before=2000-01-01'), [])
+        today = timezone.localdate(e1.created_at).isoformat()
+        self.assertEqual(len(self.ids(f'/api/expenses/?created_after={today}&created_before={today}')), 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.fish = AnimalType.objects.create(code='fish', name='Fish')
+        self.goat = AnimalType.objects.create(code='goat', name='Goat')
+        self.b1 = Batch.objects.create(animal=self.fish, arrival_date='2025-11-01', initial_quantity=10)
+        self.b2 = Batch.objects.create(animal=self.goat, arrival_date='2025-11-02', initial_quantity=4)
+        self.e1 = Expense.objects.create(batch=self.b1, description='vet, "urgent"', amount='20.50', recorded_by=self.admin)
+        Expense.objects.create(batch=self.b2, description='feed', amount='3.25')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+    def test_csv_is_filtered_and_quoted(self):
+        response, body = self.export(f'/api/export/expenses.csv?animal={self.fish.pk}')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.csv"')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0], ['id', 'batch', 'serial_number', 'animal', 'description', 'amount',
+                                   'recorded_by', 'created_at'])
+        self.assertEqual(rows[1][:7], [str(self.e1.pk), str(self.b1.pk), self.b1.serial_number, 'fish',
+                                       'vet, "urgent"', '20.50', 'admin'])
+        self.assertEqual(len(rows), 2)
+    def test_ndjson_and_errors(self):
+        _, body = self.export('/api/export/batches.ndjson?arrival_after=2025-11-02')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(r['id'], r['animal'], r['expenses_total']) for r in rows], [(self.b2.pk, 'goat', '3.25')])
+        self.assertEqual(self.client.get('/api/export/users.csv').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/batches.xml').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/batches.csv?arrival_after=soon').status_code, 400)
+        self.client.force_authenticate(User.objects.create_user('u','u@a.com','pass'))
+        self.assertEqual(self.client.get('/api/export/batches.csv').status_code, 403)
+
+
+@override_settings(STORAGES={"staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}})
+class CsvImportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.fish = AnimalType.objects.create(code='fish', name='Fish')
+        self.existing = Batch.objects.create(animal=self.fish, arrival_date='2025-01-01', initial_quantity=5,
+                                             serial_number='OLD-1')
+    def write(self, text):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write(text)
+        handle.close()
+        return handle.name
+    def run_import(self, kind, text, **options):
+        err = StringIO()
+        call_command('import_farm_csv', kind, self.write(text), user='admin', stdout=StringIO(), stderr=err,
+                     **options)
+        return err.getvalue()
+    def test_import_keeps_ledgers_summary_and_history(self):
+        errors = self.run_import('batches', 'serial_number,animal,arrival_date,initial_quantity,created_at\n'
+                                            'H-1,fish,2024-03-01,100,2024-03-01 08:00\n'
+                                            'H-2,cow,2024-03-02,10,\n'
+                                            'OLD-1,fish,2024-03-03,10,\n'
+                                            ',fish,2024-03-04,7,\n', chunk_size=2)
+        self.assertIn('line 3: animal: Unknown animal type "cow".', errors)
+        self.assertIn('line 4: serial_number: Batch "OLD-1" already exists.', errors)
+        h1 = Batch.objects.get(serial_number='H-1')
+        self.assertEqual(h1.created_at.date(), date(2024, 3, 1))
+        self.assertTrue(Batch.objects.filter(serial_number='BATCH-20240304-1').exists())
+
+        errors = self.run_import('expenses', 'serial_number,description,amount,created_at\n'
+                                             'H-1,vet,10.50,2024-03-05T09:00:00\n'
+                                             'H-1,feed,-,\n'
+                                             'NOPE,vet,1.00,\n'
+                                             'OLD-1,vet,2.25,\n')
+        self.assertIn('line 3: amount:', errors)
+        self.assertIn('line 4: serial_number: Batch "NOPE" does not exist.', errors)
+        self.run_import('mortalities', 'serial_number,count,approved,created_at\n'
+                                       'H-1,4,True,2024-03-06 10:00\n'
+                                       'H-1,1,False,2024-03-07 10:00\n')
+        self.run_import('feedings', 'serial_number,bags,amount\nH-1,2,30.25\n')
+
+        h1.refresh_from_db()
+        self.assertEqual((h1.expenses_total, h1.feed_total, h1.feed_bags_total, h1.current_quantity),
+                         (Decimal('10.50'), Decimal('30.25'), 2, 96))
+        self.assertEqual(Expense.objects.get(batch=h1).created_at.date(), date(2024, 3, 5))
+        self.assertEqual(Expense.objects.get(batch=h1).recorded_by, self.admin)
+        death = MortalityRecord.objects.get(batch=h1, approved=True)
+        self.assertEqual((death.approved_by, death.approved_at.date()), (self.admin, date(2024, 3, 6)))
+        summary = lambda: list(MonthlyAnimalSummary.objects.order_by('month').values_list(
+            'month', 'batch_count', 'heads_in', 'deaths', 'expenses_total', 'feed_total', 'feed_bags_total'))
+        incremental = summary()
+        MonthlyAnimalSummary.objects.rebuild()
+        self.assertEqual(summary(), incremental)
+        self.assertEqual(list(BatchDailySnapshot.objects.filter(batch=h1, day='2024-03-06')
+                              .values_list('quantity', 'expenses_total')), [(96, Decimal('10.50'))])
+    def test_resume_and_admin_upload(self):
+        text = 'serial_number,description,amount\nOLD-1,a,1.25\nOLD-1,b,2.25\nOLD-1,c,4.25\n'
+        self.run_import('expenses', text, start_line=3)
+        self.assertEqual(sorted(Expense.objects.values_list('description', flat=True)), ['b', 'c'])
+        with self.assertRaises(CommandError):
+            self.run_import('expenses', 'serial_number,amount\nOLD-1,1.00\n')
+
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile('e.csv', text.encode())
+        response = self.client.post('/admin/farm/batch/import/', {'kind': 'expenses', 'file': upload})
+        self.assertContains(response, 'Imported 3 row(s), rejected 0.')
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.expenses_total, Decimal('14.25'))
+
+        upload = SimpleUploadedFile('e.csv', (text + 'NOPE,d,1.00\n').encode())
+        response = self.client.post('/admin/farm/batch/import/', {'kind': 'expenses', 'file': upload,
+                                                                   'start_line': 5, 'error_report': 'on'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(list(csv.reader(StringIO(response.content.decode()))),
+                         [['line', 'column', 'message'], ['5', 'serial_number', 'Batch "NOPE" does not exist.']])
+
+        chunk = CsvImporter.import_chunk
+        def fail_second_chunk(importer, rows):
+            if importer.last_line is not None:
+                raise RuntimeError('disk full')
+            chunk(importer, rows)
+        with mock.patch('farm.admin.CsvImporter', partial(CsvImporter, chunk_size=2)), \
+                mock.patch.object(CsvImporter, 'import_chunk', fail_second_chunk):
+            upload = SimpleUploadedFile('e.csv', text.encode())
+            response = self.client.post('/admin/farm/batch/import/', {'kind': 'expenses', 'file': upload})
+        self.assertContains(response, 'disk full: rows up to line 3 are committed; upload the file again with '
+                                      'start line 4 to continue.')
+    def test_overlong_serial_is_a_bad_row(self):
+        errors = self.run_import('batches', 'serial_number,animal,arrival_date,initial_quantity\n'
+                                            f'{"X" * 51},fish,2024-04-01,5\n'
+                                            'OK-1,fish,2024-04-01,6\n')
+        self.assertIn('line 2: serial_number: Ensure this value has at most 50 characters (it has 51).', errors)
+        self.assertTrue(Batch.objects.filter(serial_number='OK-1').exists())
+    def test_explicit_serials_are_observed_before_allocating(self):
+        self.run_import('batches', 'serial_number,animal,arrival_date,initial_quantity\n'
+                                   ',fish,2024-04-01,5\n'
+                                   'BATCH-20240401-1,fish,2024-04-01,6\n')
+        self.assertEqual(dict(Batch.objects.filter(arrival_date='2024-04-01').values_list('initial_quantity',
+                                                                                          'serial_number')),
+                         {5: 'BATCH-20240401-2', 6: 'BATCH-20240401-1'})
+
+
+class BatchSnapshotTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin','a@a.com','pass')
+        self.at = AnimalType.objects.create(code='fish', name='Fish')
+        self.b = Batch.objects.create(animal=self.at, arrival_date='2025-11-01', initial_quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    def backdate(self, obj, day, field='created_at'):
+        type(obj).objects.filter(pk=obj.pk).update(**{field: f'{day}T12:00:00+01:00'})
+    def series(self):
+        return [(r['day'], r['quantity'], r['expenses_total'], r['feed_total'], r['unit_cost'])
+                for r in self.client.get(f'/api/batches/{self.b.pk}/timeseries/').json()]
+    def test_incremental_fill_matches_full_rebuild(self):
+        self.backdate(self.b, '2025-11-01')
+        self.backdate(Expense.objects.create(batch=self.b, description='vet', amount='20.50'), '2025-11-02')
+        self.backdate(FeedingRecord.objects.create(batch=self.b, bags=1, amount='9.50'), '2025-11-04')
+        call_command('snapshot_batches', stdout=StringIO())
+        self.assertEqual(self.series(), [
+            ('2025-11-01', 10, '0.00', '0.00', '0.0000'),
+            ('2025-11-02', 10, '20.50', '0.00', '2.0500'),
+            ('2025-11-04', 10, '20.50', '9.50', '3.0000'),
+        ])
+        self.assertEqual(self.client.get('/api/batches/abc/timeseries/').status_code, 404)
+        first_run = BatchDailySnapshot.objects.get(day='2025-11-04').computed_at
+        # New activity today: only today's row is written, earlier days are kept
+        MortalityRecord.objects.create(batch=self.b, count=4).approve(self.admin)
+        call_command('snapshot_batches', stdout=StringIO())
+        incremental = self.series()
+        self.assertEqual(incremental[-1][1:], (6, '20.50', '9.50', '5.0000'))
+        self.assertEqual(len(incremental), 4)
+        self.assertEqual(BatchDailySnapshot.objects.get(day='2025-11-04').computed_at, first_run)
+        call_command('snapshot_batches', full=True, stdout=StringIO())
+        self.assertEqual(self.series(), incremental)
+        window = self.client.get(f'/api/batches/{self.b.pk}/timeseries/?from=2025-11-03&to=2025-11-04').json()
+        self.assertEqual([r['day'] for r in window], ['2025-11-04'])
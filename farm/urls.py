@@ -6,14 +6,20 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
-from .views import AnimalTypeViewSet, BatchViewSet, MortalityViewSet, ShopItemViewSet, RegisterAPIView
+from . import async_views
+from .views import (AnimalTypeViewSet, BatchViewSet, MortalityViewSet, ShopItemViewSet, RegisterAPIView,
+                    BulkRecordAPIView, SyncAPIView, MonthlySummaryViewSet, ExpenseViewSet, FeedingRecordViewSet,
+                    ExportAPIView, ShopCatalogAPIView)
 
 
 router = DefaultRouter()
 router.register(r'animal-types', AnimalTypeViewSet)
 router.register(r'batches', BatchViewSet)
 router.register(r'mortalities', MortalityViewSet, basename='mortality')
+router.register(r'expenses', ExpenseViewSet)
+router.register(r'feedings', FeedingRecordViewSet, basename='feeding')
 router.register(r'shop', ShopItemViewSet, basename='shop')
+router.register(r'analytics/monthly', MonthlySummaryViewSet, basename='analytics-monthly')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -21,6 +27,22 @@ urlpatterns = [
     # router endpoints
     path('', include(router.urls)),
 
+    # bulk record ingestion
+    path('records/bulk/', BulkRecordAPIView.as_view(), name='records-bulk'),
+    path('sync/', SyncAPIView.as_view(), name='sync'),
+
+    # public storefront, served from a cached snapshot
+    path('catalog/', ShopCatalogAPIView.as_view(), name='shop-catalog'),
+
+    # streaming CSV / NDJSON exports
+    path('export/<str:kind>.<str:fmt>', ExportAPIView.as_view(), name='export'),
+
+    # async read path (same payloads as the viewsets, for ASGI serving)
+    path('async/batches/', async_views.batch_list, name='async-batch-list'),
+    path('async/batches/<int:pk>/', async_views.batch_detail, name='async-batch-detail'),
+    path('async/mortalities/', async_views.mortality_list, name='async-mortality-list'),
+    path('async/shop/', async_views.shop_list, name='async-shop-list'),
+
     # registration
     path('register/', RegisterAPIView.as_view(), name='register'),
 
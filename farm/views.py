@@ -1,17 +1,36 @@
-from rest_framework import viewsets, status
+from datetime import datetime
+
+from rest_framework import generics, viewsets, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
+from rest_framework.authentication import SessionAuthentication
+from django_filters.utils import translate_validation
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser,AllowAny
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.urls import reverse
+from django.utils.http import quote_etag
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 
-from .models import AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, ShopItem
+from .models import (AnimalType, Batch, Expense, FeedingRecord, MortalityRecord, ShopItem, MonthlyAnimalSummary,
+                     BatchDailySnapshot)
 from .serializers import (AnimalTypeSerializer, BatchSerializer, ExpenseSerializer,
-                          FeedingRecordSerializer, MortalityRecordSerializer, ShopItemSerializer,RegisterSerializer)
+                          FeedingRecordSerializer, MortalityRecordSerializer, ShopItemSerializer,RegisterSerializer,
+                          BulkIdsSerializer, MonthlySummarySerializer, BatchSnapshotSerializer, PriceSerializer,
+                          BulkRepriceSerializer)
 from .permissions import IsStaffOrAdmin
+from .bulk import MAX_BULK_RECORDS, ingest_records, sync_records
+from .parsers import GzipJSONParser
+from .pagination import BatchPagination, MortalityPagination, ShopPagination, ExpensePagination, FeedingPagination
+from .filters import BatchFilter, MortalityFilter, ExpenseFilter, FeedingRecordFilter
+from .exports import EXPORTS, EXPORT_FORMATS, streaming_export
+from .authentication import CachedJWTAuthentication
+from . import cache
 
 class RegisterAPIView(APIView):
     permission_classes = [AllowAny]
@@ -28,19 +47,252 @@ class RegisterAPIView(APIView):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class BulkRecordAPIView(APIView):
+    """Accepts a mixed list of expense/feeding/mortality records across batches in one request."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        records = request.data.get('records') if isinstance(request.data, dict) else None
+        if not isinstance(records, list) or not records:
+            return Response({'detail': 'records must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > MAX_BULK_RECORDS:
+            return Response({'detail': f'at most {MAX_BULK_RECORDS} records per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = ingest_records(records, request.user)
+        created = sum(1 for r in results if r['status'] == 'created')
+        if created == len(results):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'failed': len(results) - created, 'results': results}, status=code)
+
+class SyncAPIView(APIView):
+    """
+    Flush endpoint for the offline client queue. Same payload as records/bulk
+    plus a client-generated ``key`` per record; replays are answered from
+    SyncReceipt instead of inserting twice. Bodies may be gzip-compressed.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [GzipJSONParser]
+
+    def post(self, request):
+        records = request.data.get('records') if isinstance(request.data, dict) else None
+        if not isinstance(records, list) or not records:
+            return Response({'detail': 'records must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > MAX_BULK_RECORDS:
+            return Response({'detail': f'at most {MAX_BULK_RECORDS} records per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = sync_records(records, request.user)
+        except IntegrityError:
+            return Response({'detail': 'records are being synced by another request, retry'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+class ExportAPIView(APIView):
+    """
+    Streams every matching row of one table as CSV or NDJSON, e.g.
+    ``export/expenses.csv?animal=1&created_after=2025-01-01&created_before=2025-12-31``.
+    Takes the same filters as the matching list endpoint. Session auth is
+    accepted too, so staff can download straight from the admin.
+    """
+    authentication_classes = [CachedJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsStaffOrAdmin]
+
+    def get(self, request, kind, fmt):
+        if kind not in EXPORTS or fmt not in EXPORT_FORMATS:
+            raise Http404
+        model, filterset_class, _ = EXPORTS[kind]
+        filterset = filterset_class(request.query_params, queryset=model.objects.all(), request=request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return streaming_export(kind, fmt, filterset.qs, filename=kind)
+
 class AnimalTypeViewSet(viewsets.ModelViewSet):
     queryset = AnimalType.objects.all()
     serializer_class = AnimalTypeSerializer
     permission_classes = [IsAdminUser]
 
 class BatchViewSet(viewsets.ModelViewSet):
-    queryset = Batch.objects.all().order_by('-arrival_date')
+    # Animal joined and costs annotated: a page of batches is one SELECT
+    queryset = Batch.objects.select_related('animal').with_costs().order_by('-arrival_date', '-id')
     serializer_class = BatchSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BatchPagination
+    filterset_class = BatchFilter
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    # ---------- VERSIONED READS ----------
+    # Reads first fetch (id, version) stubs; unchanged data answers 304 from the
+    # ETag and serialized payloads come from the versioned cache where possible.
+    def tag(self, response, etag):
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def not_modified(self, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+
+    # ---------- SPARSE FIELDSETS ----------
+    # ?fields=serial_number,animal_name,current_quantity keeps only those fields
+    # (plus id); nested objects are left out unless named in ?expand=animal.
+    # Either parameter switches a read to the sparse representation.
+    def sparse_fields(self):
+        """The field names to serialize, or None for the full representation."""
+        params = self.request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        columns = BatchSerializer.field_columns
+        expandable = BatchSerializer.expandable
+
+        def names(param):
+            return [name.strip() for name in params.get(param, '').split(',') if name.strip()]
+
+        fields = names('fields') or [name for name in columns if name not in expandable]
+        expand = names('expand')
+        errors = {}
+        unknown = [name for name in fields if name not in columns]
+        if unknown:
+            errors['fields'] = [f"unknown field(s): {', '.join(unknown)}"]
+        if set(expand) - set(expandable):
+            errors['expand'] = [f"can expand: {', '.join(expandable)}"]
+        if errors:
+            raise ValidationError(errors)
+        return sorted(set(fields) | set(expand) | {'id'})
+
+    def sparse_queryset(self, fields):
+        """Only the columns the requested fields read, plus what paging and caching need."""
+        columns = {'id', 'version', 'arrival_date'}
+        for name in fields:
+            columns.update(BatchSerializer.field_columns[name])
+        queryset = Batch.objects.all()
+        if any(column.startswith('animal__') for column in columns):
+            queryset = queryset.select_related('animal')
+        if {'total_cost', 'unit_cost'} & set(fields):
+            queryset = queryset.with_costs()
+        return queryset.only(*columns)
+
+    def serialize_cached(self, stubs, fields=None):
+        variant = cache.fields_variant(fields)
+        payloads = cache.get_payloads(stubs, variant)
+        missing = [stub.pk for stub in stubs if stub.pk not in payloads]
+        if missing:
+            queryset = self.get_queryset() if fields is None else self.sparse_queryset(fields)
+            fresh = list(queryset.filter(pk__in=missing))
+            for obj in fresh:
+                payloads[obj.pk] = self.get_serializer(obj, fields=fields).data
+            cache.store_payloads(fresh, payloads, variant)
+        return [payloads[stub.pk] for stub in stubs if stub.pk in payloads]
+
+    def list(self, request, *args, **kwargs):
+        fields = self.sparse_fields()
+        stubs = self.filter_queryset(Batch.objects.only('id', 'version', 'arrival_date'))
+        page = self.paginate_queryset(stubs)
+        rows = page if page is not None else list(stubs.order_by('-arrival_date', '-id'))
+
+        etag = cache.list_etag(request, rows)
+        if cache.etag_matches(request, etag):
+            return self.not_modified(etag)
+
+        data = self.serialize_cached(rows, fields)
+        response = self.get_paginated_response(data) if page is not None else Response(data)
+        return self.tag(response, etag)
+
+    def get_stub(self, *fields):
+        """Only ``fields`` of the batch in the URL; a malformed pk is a 404, as with get_object()."""
+        return generics.get_object_or_404(Batch.objects.only(*fields), pk=self.kwargs['pk'])
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.sparse_fields()
+        stub = self.get_stub('id', 'version')
+        self.check_object_permissions(request, stub)
+
+        etag = cache.detail_etag(stub.pk, stub.version, cache.fields_variant(fields))
+        if cache.etag_matches(request, etag):
+            return self.not_modified(etag)
+        data = self.serialize_cached([stub], fields)
+        if not data:
+            raise Http404
+        return self.tag(Response(data[0]), etag)
+
+    @action(detail=True, methods=['GET'])
+    def full(self, request, pk=None):
+        """
+        The batch with the newest ``?limit=`` (default 20, max 100) expenses,
+        feedings and mortalities embedded. Each collection carries a ``next``
+        link into its list endpoint for older rows. Four queries whatever the
+        sizes, and cached per batch version like the plain detail.
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            raise ValidationError({'limit': 'expected an integer'})
+        stub = self.get_stub('id', 'version')
+        self.check_object_permissions(request, stub)
+
+        variant = f'full{limit}'
+        etag = cache.detail_etag(stub.pk, stub.version, variant)
+        if cache.etag_matches(request, etag):
+            return self.not_modified(etag)
+        payload = cache.get_payloads([stub], variant).get(stub.pk)
+        if payload is None:
+            payload = self.full_payload(request, stub.pk, limit)
+            if payload is None:
+                raise Http404
+            cache.store_payloads([stub], {stub.pk: payload}, variant)
+        return self.tag(Response(payload), etag)
+
+    # payload key, related name, list route, queryset, serializer, pagination of each embedded collection
+    EMBEDDED = (
+        ('expenses', 'expenses', 'expense-list', Expense.objects.select_related('recorded_by'),
+         ExpenseSerializer, ExpensePagination),
+        ('feedings', 'feeding_records', 'feeding-list', FeedingRecord.objects.select_related('recorded_by'),
+         FeedingRecordSerializer, FeedingPagination),
+        ('mortalities', 'mortalities', 'mortality-list', MortalityRecord.objects.select_related('approved_by'),
+         MortalityRecordSerializer, MortalityPagination),
+    )
+
+    def full_payload(self, request, pk, limit):
+        # One sliced Prefetch per collection: limit + 1 rows tell whether there is a next page
+        prefetches = [
+            Prefetch(related, queryset=queryset.order_by(*pagination.ordering)[:limit + 1], to_attr=f'first_{key}')
+            for key, related, _, queryset, _, pagination in self.EMBEDDED
+        ]
+        batch = self.get_queryset().filter(pk=pk).prefetch_related(*prefetches).first()
+        if batch is None:
+            return None
+
+        payload = {'batch': self.get_serializer(batch).data}
+        for key, _, route, _, serializer_class, pagination in self.EMBEDDED:
+            rows = getattr(batch, f'first_{key}')
+            payload[key] = {
+                'next': pagination().continuation_link(request, f'{reverse(route)}?batch={pk}', rows, limit),
+                'results': serializer_class(rows[:limit], many=True).data,
+            }
+        return payload
+
+    @action(detail=True, methods=['GET'])
+    def timeseries(self, request, pk=None):
+        """Daily headcount and cumulative costs from the snapshot table; ``?from=&to=`` as YYYY-MM-DD."""
+        self.get_stub('id')
+        snapshots = BatchDailySnapshot.objects.filter(batch_id=pk).order_by('day')
+        for param, lookup in (('from', 'day__gte'), ('to', 'day__lte')):
+            if request.query_params.get(param):
+                try:
+                    day = datetime.strptime(request.query_params[param], '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValidationError({param: 'expected YYYY-MM-DD'})
+                snapshots = snapshots.filter(**{lookup: day})
+        return Response(BatchSnapshotSerializer(snapshots, many=True).data)
+
     @action(detail=True, methods=['POST'], permission_classes=[IsAuthenticated])
     def expense(self, request, pk=None):
         batch = self.get_object()
@@ -84,37 +336,153 @@ class BatchViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'detail':str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['POST'], permission_classes=[IsAdminUser])
+    def bulk_move_to_shop(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        moved = Batch.objects.filter(pk__in=serializer.validated_data['ids']).move_to_shop(by_user=request.user)
+        return Response({
+            'detail':'moved to shop',
+            'moved':len(moved),
+            'batches':[{'id':b.pk,'locked_unit_cost':str(b.locked_unit_cost)} for b in moved],
+        }, status=status.HTTP_200_OK)
+
 class MortalityViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = MortalityRecord.objects.all().order_by('-created_at')
+    queryset = MortalityRecord.objects.select_related('approved_by').order_by('-created_at', '-id')
     serializer_class = MortalityRecordSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MortalityPagination
+    filterset_class = MortalityFilter
 
     @action(detail=True, methods=['POST'], permission_classes=[IsAdminUser])
     def approve(self, request, pk=None):
         mr = get_object_or_404(MortalityRecord, pk=pk)
         try:
             with transaction.atomic():
-                mr.approve(request.user)
+                approved = mr.approve(request.user)
+            if not approved:
+                return Response({'detail':'already approved'}, status=status.HTTP_400_BAD_REQUEST)
             return Response({'detail':'approved'}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'detail':str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['POST'], permission_classes=[IsAdminUser])
+    def bulk_approve(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        approved = MortalityRecord.objects.filter(pk__in=serializer.validated_data['ids']).approve(request.user)
+        return Response({'detail':'approved','approved':approved}, status=status.HTTP_200_OK)
+
+class ExpenseViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Expense.objects.select_related('recorded_by').order_by('-created_at', '-id')
+    serializer_class = ExpenseSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExpensePagination
+    filterset_class = ExpenseFilter
+
+class FeedingRecordViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = FeedingRecord.objects.select_related('recorded_by').order_by('-created_at', '-id')
+    serializer_class = FeedingRecordSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = FeedingPagination
+    filterset_class = FeedingRecordFilter
+
 class ShopItemViewSet(viewsets.ModelViewSet):
-    queryset = ShopItem.objects.all()
+    queryset = ShopItem.objects.all().order_by('-created_at', '-id')
     serializer_class = ShopItemSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = ShopPagination
 
     @action(detail=True, methods=['POST'], permission_classes=[IsAdminUser])
     def set_price(self, request, pk=None):
         item = self.get_object()
-        price = request.data.get('selling_price_per_unit')
-        try:
-            price_dec = float(price)
-        except Exception:
+        serializer = PriceSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({'detail':'invalid price'}, status=400)
-        # basic validation: cannot set price <= locked_unit_cost
-        if item.batch.locked_unit_cost is not None and price_dec <= float(item.batch.locked_unit_cost):
-            return Response({'detail':'selling price must be greater than locked unit cost'}, status=400)
-        item.selling_price_per_unit = price_dec
-        item.save()
-        return Response({'detail':'price set','selling_price_per_unit':item.selling_price_per_unit})
+        # cannot set price <= locked_unit_cost
+        updated, rejected = ShopItem.objects.filter(pk=item.pk).reprice(
+            prices={item.pk: serializer.validated_data['selling_price_per_unit']})
+        if rejected:
+            return Response({'detail':rejected[0]['detail']}, status=400)
+        return Response({'detail':'price set','selling_price_per_unit':str(updated[item.pk])})
+
+    @action(detail=False, methods=['POST'], permission_classes=[IsAdminUser])
+    def bulk_reprice(self, request):
+        """
+        ``{"prices": [{"id": 1, "price": "12.50"}, ...]}`` or ``{"markup_percent": "25"}``
+        (locked unit cost plus 25%), either optionally limited by ``"animal": <id>``.
+        Items priced at or below cost come back under ``rejected``.
+        """
+        serializer = BulkRepriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        items = ShopItem.objects.all()
+        if 'animal' in data:
+            items = items.filter(batch__animal_id=data['animal'])
+        if 'prices' in data:
+            updated, rejected = items.reprice(prices={row['id']: row['price'] for row in data['prices']})
+        else:
+            updated, rejected = items.reprice(markup=data['markup_percent'])
+
+        if not rejected:
+            code = status.HTTP_200_OK
+        elif updated:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'updated': len(updated),
+            'items': [{'id': pk, 'selling_price_per_unit': str(price)} for pk, price in updated.items()],
+            'rejected': rejected,
+        }, status=code)
+
+class ShopCatalogAPIView(APIView):
+    """
+    Public storefront listing: every priced shop item with stock left, with
+    its animal, available quantity and price. Served from a cached snapshot
+    that the write paths rebuild, so anonymous traffic does not reach the
+    database; no authentication runs either.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        catalog = cache.get_catalog()
+        if catalog is None:
+            catalog = ShopItem.objects.catalog()
+            cache.add_catalog(catalog)
+        etag = quote_etag(f"catalog-{catalog['generated_at']}")
+        if cache.etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(catalog)
+        response['ETag'] = etag
+        response['Cache-Control'] = f'public, max-age={cache.CATALOG_TIMEOUT // 2}'
+        return response
+
+class MonthlySummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Cost per head, feed spend and mortality rate per animal type and arrival
+    month, read from the pre-aggregated summary table.
+    Optional filters: ``?animal=<id>&from=YYYY-MM&to=YYYY-MM``.
+    """
+    serializer_class = MonthlySummarySerializer
+    permission_classes = [IsStaffOrAdmin]
+    pagination_class = None
+
+    def get_queryset(self):
+        qs = MonthlyAnimalSummary.objects.select_related('animal').order_by('month', 'animal_id')
+        params = self.request.query_params
+        if params.get('animal'):
+            try:
+                qs = qs.filter(animal_id=int(params['animal']))
+            except ValueError:
+                raise ValidationError({'animal': 'expected an integer'})
+        for param, lookup in (('from', 'month__gte'), ('to', 'month__lte')):
+            if params.get(param):
+                try:
+                    month = datetime.strptime(params[param], '%Y-%m').date()
+                except ValueError:
+                    raise ValidationError({param: 'expected YYYY-MM'})
+                qs = qs.filter(**{lookup: month})
+        return qs
@@ -88,7 +88,7 @@ async function loadBatches() {
     if (!batchList) return;
 
     try {
-        const response = await fetch(`${BASE_URL}/batches/`, {
+        const response = await fetch(`${BASE_URL}/batches/?fields=serial_number,animal_name,current_quantity`, {
             headers: { "Authorization": `Bearer ${token}` }
         });
 
@@ -148,10 +148,93 @@ function openMortalityModal(id) {
     showModal("mortalityModal");
 }
 
-/* ================= FEEDING (UPDATED) ================= */
-async function submitFeeding() {
+/* ================= OFFLINE SYNC QUEUE ================= */
+// Records are saved locally first and flushed to /sync/ in batches.
+// Each carries a client-generated key so a retried flush never creates duplicates.
+const SYNC_QUEUE_KEY = "farm_sync_queue";
+const SYNC_BATCH_SIZE = 200;
+const SYNC_RETRY_MS = 30000;
+let syncInFlight = false;
+
+function newRecordKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    // crypto.randomUUID needs a secure context; fall back to an RFC 4122 v4 key
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, b => b.toString(16).padStart(2, "0")).join("");
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+function readQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(SYNC_QUEUE_KEY)) || [];
+    } catch (err) {
+        return [];
+    }
+}
+
+function writeQueue(queue) {
+    localStorage.setItem(SYNC_QUEUE_KEY, JSON.stringify(queue));
+}
+
+function enqueueRecord(type, fields) {
+    const queue = readQueue();
+    queue.push({ key: newRecordKey(), type, batch: activeBatchId, ...fields });
+    writeQueue(queue);
+}
+
+async function gzipBody(text) {
+    if (!window.CompressionStream) return null;
+    const stream = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+    return await new Response(stream).arrayBuffer();
+}
+
+async function flushQueue() {
     const token = localStorage.getItem("farm_token");
+    if (!token || syncInFlight || !navigator.onLine) return;
+
+    const batch = readQueue().slice(0, SYNC_BATCH_SIZE);
+    if (!batch.length) return;
 
+    syncInFlight = true;
+    let flushed = false;
+    try {
+        const json = JSON.stringify({ records: batch });
+        const compressed = await gzipBody(json);
+        const headers = {
+            "Authorization": `Bearer ${token}`,
+            "Content-Type": "application/json"
+        };
+        if (compressed) headers["Content-Encoding"] = "gzip";
+
+        const response = await fetch(`${BASE_URL}/sync/`, {
+            method: "POST",
+            headers,
+            body: compressed || json
+        });
+        if (!response.ok) return;  // keep everything queued, retry later
+
+        const data = await response.json();
+        // created, duplicate and invalid are all final; drop them from the queue
+        const done = new Set(data.results.map(r => r.key).filter(Boolean));
+        const rejected = data.results.filter(r => r.status === "invalid").length;
+        writeQueue(readQueue().filter(r => !done.has(r.key)));
+
+        if (rejected) alert(`${rejected} record(s) were rejected by the server.`);
+        loadBatches();
+        flushed = true;
+    } catch (err) {
+        // offline or flaky link: records stay queued
+    } finally {
+        syncInFlight = false;
+    }
+    // Records queued during this flush, or past SYNC_BATCH_SIZE, go out now rather than on the next trigger
+    if (flushed && readQueue().length) flushQueue();
+}
+
+/* ================= FEEDING (UPDATED) ================= */
+function submitFeeding() {
     const bagsInput = document.getElementById("feedingBags");
     const amountInput = document.getElementById("feedingAmount");
     const noteInput = document.getElementById("feedingNote");
@@ -167,63 +250,39 @@ async function submitFeeding() {
         return;
     }
 
-    await fetch(`${BASE_URL}/batches/${activeBatchId}/feeding/`, {
-        method: "POST",
-        headers: {
-            "Authorization": `Bearer ${token}`,
-            "Content-Type": "application/json"
-        },
-        body: JSON.stringify({ bags, amount, note })
-    });
+    enqueueRecord("feeding", { bags, amount, note });
 
-    alert("Feeding added!");
+    alert("Feeding saved!");
     closeModals();
-    loadBatches();
+    flushQueue();
 }
 
 /* ================= EXPENSE ================= */
-async function submitExpense() {
-    const token = localStorage.getItem("farm_token");
-
+function submitExpense() {
     const descInput = document.getElementById("expenseDesc");
     const amountInput = document.getElementById("expenseAmount");
 
     const description = descInput.value;
     const amount = amountInput.value;
 
-    await fetch(`${BASE_URL}/batches/${activeBatchId}/expense/`, {
-        method: "POST",
-        headers: {
-            "Authorization": `Bearer ${token}`,
-            "Content-Type": "application/json"
-        },
-        body: JSON.stringify({ description, amount })
-    });
+    enqueueRecord("expense", { description, amount });
 
-    alert("Expense added!");
+    alert("Expense saved!");
     closeModals();
-    loadBatches();
+    flushQueue();
 }
 
 /* ================= MORTALITY ================= */
-async function submitMortality() {
-    const token = localStorage.getItem("farm_token");
+function submitMortality() {
     const countInput = document.getElementById("mortalityCount");
 
     const count = countInput.value;
 
-    await fetch(`${BASE_URL}/batches/${activeBatchId}/mortality/`, {
-        method: "POST",
-        headers: {
-            "Authorization": `Bearer ${token}`,
-            "Content-Type": "application/json"
-        },
-        body: JSON.stringify({ count })
-    });
+    enqueueRecord("mortality", { count });
 
-    alert("Mortality recorded!");
+    alert("Mortality saved!");
     closeModals();
-    loadBatches();
+    flushQueue();
 }
 
 /* ================= LOGOUT ================= */
@@ -238,5 +297,8 @@ document.addEventListener("DOMContentLoaded", () => {
 
     if (path.endsWith("dashboard.html")) {
         loadBatches();
+        flushQueue();
+        window.addEventListener("online", flushQueue);
+        setInterval(flushQueue, SYNC_RETRY_MS);
     }
 });
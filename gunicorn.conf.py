@@ -0,0 +1,44 @@
+"""
+Gunicorn settings, picked up automatically from the working directory.
+
+The Django app is imported once in the master (``preload_app``) and forked into
+the workers, and the release check in ``on_starting`` only verifies migrations
+and the static manifest; the actual migrate/collectstatic run in the Procfile
+``release`` phase. Override worker count with WEB_CONCURRENCY and the worker
+class with GUNICORN_WORKER_CLASS (e.g. ``uvicorn_worker.UvicornWorker`` when
+serving ``core.asgi:application``).
+"""
+import os
+
+
+def available_cores():
+    # Cores this process may run on, which in a container can be fewer than the host has
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * available_cores() + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+accesslog = '-'
+
+
+def on_starting(server):
+    # The app is already loaded (preload_app), so Django is set up here
+    from django.db import connections
+
+    from core.release import ensure_release
+
+    apply = os.environ.get('RELEASE_CHECK_APPLY') == 'True'
+    migrations, static = ensure_release(apply=apply)
+    if migrations or static:
+        server.log.warning(
+            "Release check: %d unapplied migration(s), %d stale static file(s)%s",
+            len(migrations), len(static), "; applied" if apply else "; run the release phase",
+        )
+    # Don't hand the master's database connection to forked workers
+    connections.close_all()